@@ -0,0 +1,257 @@
+import os
+import json
+import time
+import uuid
+import threading
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from neo4j_drivers import get_driver
+from search_cache import db_identity, graph_version
+
+# In-process entity index; leave ENTITY_ANN_INDEX_DIR empty to keep using
+# the Neo4j vector index for seed lookups
+ENTITY_ANN_INDEX_DIR = os.getenv("ENTITY_ANN_INDEX_DIR", "")
+# Inverted lists probed per query and candidates re-scored with exact cosine
+ANN_NPROBE = int(os.getenv("ANN_NPROBE", "16"))
+ANN_RESCORE_CANDIDATES = int(os.getenv("ANN_RESCORE_CANDIDATES", "200"))
+ANN_TRAIN_SAMPLE = int(os.getenv("ANN_TRAIN_SAMPLE", "20000"))
+ANN_TRAIN_ITERATIONS = 10
+ANN_PAGE_SIZE = 10000
+
+entity_embedding_count_query = """
+MATCH (e:__Entity__)
+WHERE e.description_embedding IS NOT NULL
+RETURN count(e) AS count
+"""
+
+entity_embedding_page_query = """
+MATCH (e:__Entity__)
+WHERE e.id > $after AND e.description_embedding IS NOT NULL
+RETURN e.id AS id, e.description_embedding AS embedding
+ORDER BY e.id
+LIMIT $pageSize
+"""
+
+
+def _unit_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def _train_centroids(sample: np.ndarray, nlist: int, iterations: int, rng: np.random.Generator) -> np.ndarray:
+    """Spherical k-means: centroids are unit vectors and rows go to the most similar one"""
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        empty = np.bincount(assign, minlength=nlist) == 0
+        # Re-seed empty lists from random rows
+        sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+        centroids = _unit_rows(sums)
+    return centroids
+
+
+class EntityAnnIndex:
+    """
+    IVF index over the entity description embeddings, memory-mapped from disk.
+
+    Rows are grouped by their nearest centroid and stored twice: as int8
+    codes with a per-row scale, which are scanned for the probed lists, and
+    as unit float32 vectors, of which only the candidates are read to
+    re-score them with exact cosine.
+
+    Args:
+        path: Index folder written by build_entity_ann_index()
+    """
+
+    def __init__(self, path: str):
+        with open(os.path.join(path, "meta.json")) as f:
+            self.meta = json.load(f)
+        files = {name: os.path.join(path, file) for name, file in self.meta["files"].items()}
+        self.centroids = np.load(files["centroids"])
+        self.offsets = np.load(files["offsets"])
+        self.scales = np.load(files["scales"])
+        self.codes = np.load(files["codes"], mmap_mode="r")
+        self.vectors = np.load(files["vectors"], mmap_mode="r")
+        with open(files["ids"]) as f:
+            self.ids = json.load(f)
+
+    def search(self, embedding: List[float], k: int, nprobe: int = ANN_NPROBE,
+               rescore: int = ANN_RESCORE_CANDIDATES) -> List[Tuple[str, float]]:
+        """
+        Returns the k most similar (entity id, score) pairs, scored like the
+        Neo4j cosine index ((1 + cosine) / 2).
+        """
+        query = np.asarray(embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1)
+        candidates = max(rescore, k)
+
+        # Probe the closest lists, and more if they hold too few rows
+        rows, approx = [], []
+        for position, list_id in enumerate(np.argsort(-(self.centroids @ query))):
+            if position >= nprobe and sum(len(r) for r in rows) >= candidates:
+                break
+            start, end = self.offsets[list_id], self.offsets[list_id + 1]
+            if start == end:
+                continue
+            rows.append(np.arange(start, end))
+            approx.append((self.codes[start:end] @ query) * self.scales[start:end])
+        if not rows:
+            return []
+        rows, approx = np.concatenate(rows), np.concatenate(approx)
+
+        if len(rows) > candidates:
+            keep = np.argpartition(-approx, candidates - 1)[:candidates]
+            rows = rows[keep]
+        rows = np.sort(rows)
+        exact = self.vectors[rows] @ query
+        top = np.argsort(-exact, kind="stable")[:k]
+        return [(self.ids[rows[i]], float((1 + exact[i]) / 2)) for i in top]
+
+
+def build_entity_ann_index(db_config: Dict, version: str, path: str = ENTITY_ANN_INDEX_DIR,
+                           seed: int = 0) -> int:
+    """
+    Builds the in-process index from the entity embeddings in Neo4j.
+
+    Files of a build get a unique suffix and meta.json is replaced last, so
+    searches in other processes keep using the previous build until they
+    see the new one.
+
+    Args:
+        db_config: Database the embeddings are read from
+        version: Graph version the index is valid for
+        path: Index folder
+        seed: Random seed for centroid training
+
+    Returns:
+        Number of indexed entities
+    """
+    start_time = time.time()
+    database = db_config.get("database", "neo4j")
+    driver = get_driver(db_config)
+    records, _, _ = driver.execute_query(entity_embedding_count_query, database_=database)
+    count = records[0]["count"]
+    if not count:
+        print("No entity embeddings to index")
+        return 0
+
+    os.makedirs(path, exist_ok=True)
+    build = uuid.uuid4().hex[:12]
+    files = {name: f"{name}-{build}.{'json' if name == 'ids' else 'npy'}"
+             for name in ("ids", "centroids", "offsets", "scales", "codes", "vectors")}
+    unsorted_path = os.path.join(path, f"unsorted-{build}.npy")
+
+    # Stream unit vectors to disk page by page (keyset pagination on id)
+    ids, after, vectors = [], "", None
+    while len(ids) < count:
+        records, _, _ = driver.execute_query(entity_embedding_page_query, after=after,
+                                             pageSize=ANN_PAGE_SIZE, database_=database)
+        if not records:
+            break
+        page = _unit_rows(np.asarray([record["embedding"] for record in records], dtype=np.float32))
+        if vectors is None:
+            vectors = np.lib.format.open_memmap(unsorted_path, mode="w+", dtype=np.float32,
+                                                shape=(count, page.shape[1]))
+        # Entities embedded since the count are left for the next build
+        page = page[:count - len(ids)]
+        vectors[len(ids):len(ids) + len(page)] = page
+        ids.extend(record["id"] for record in records[:len(page)])
+        after = records[-1]["id"]
+    count = len(ids)
+
+    rng = np.random.default_rng(seed)
+    nlist = max(1, min(4096, int(np.sqrt(count))))
+    sample = np.asarray(vectors[np.sort(rng.choice(count, min(count, ANN_TRAIN_SAMPLE), replace=False))])
+    centroids = _train_centroids(sample, nlist, ANN_TRAIN_ITERATIONS, rng)
+
+    assign = np.concatenate([np.argmax(vectors[start:start + ANN_PAGE_SIZE] @ centroids.T, axis=1)
+                             for start in range(0, count, ANN_PAGE_SIZE)])
+    order = np.argsort(assign, kind="stable")
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=nlist))])
+
+    sorted_vectors = np.lib.format.open_memmap(os.path.join(path, files["vectors"]), mode="w+",
+                                               dtype=np.float32, shape=(count, vectors.shape[1]))
+    codes = np.lib.format.open_memmap(os.path.join(path, files["codes"]), mode="w+",
+                                      dtype=np.int8, shape=(count, vectors.shape[1]))
+    scales = np.empty(count, dtype=np.float32)
+    for start in range(0, count, ANN_PAGE_SIZE):
+        page = vectors[order[start:start + ANN_PAGE_SIZE]]
+        sorted_vectors[start:start + len(page)] = page
+        page_scales = np.abs(page).max(axis=1) / 127
+        page_scales[page_scales == 0] = 1
+        codes[start:start + len(page)] = np.round(page / page_scales[:, None]).astype(np.int8)
+        scales[start:start + len(page)] = page_scales
+    sorted_vectors.flush()
+    codes.flush()
+    del vectors, sorted_vectors, codes
+    os.remove(unsorted_path)
+
+    np.save(os.path.join(path, files["centroids"]), centroids)
+    np.save(os.path.join(path, files["offsets"]), offsets)
+    np.save(os.path.join(path, files["scales"]), scales)
+    with open(os.path.join(path, files["ids"]), "w") as f:
+        json.dump([ids[i] for i in order], f)
+
+    previous = _read_meta(path)
+    with open(os.path.join(path, "meta.json.tmp"), "w") as f:
+        json.dump({"database": db_identity(db_config), "index_name": db_config.get("index_name", "entity"),
+                   "version": version, "count": count, "dimensions": int(centroids.shape[1]),
+                   "nlist": nlist, "files": files}, f)
+    os.replace(os.path.join(path, "meta.json.tmp"), os.path.join(path, "meta.json"))
+    # Processes that still map the old files keep them until they reload
+    for file in (previous or {}).get("files", {}).values():
+        if os.path.exists(os.path.join(path, file)):
+            os.remove(os.path.join(path, file))
+
+    print(f"Indexed {count} entity embeddings in {nlist} lists in {time.time() - start_time:.2f} seconds")
+    return count
+
+
+def refresh_entity_ann_index(db_config: Dict) -> int:
+    """Rebuilds the in-process index for the current graph version, if enabled"""
+    if not ENTITY_ANN_INDEX_DIR:
+        return 0
+    return build_entity_ann_index(db_config, graph_version(db_config))
+
+
+def _read_meta(path: str) -> Optional[Dict]:
+    try:
+        with open(os.path.join(path, "meta.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+_loaded: Dict[str, Tuple[float, EntityAnnIndex]] = {}
+_loaded_lock = threading.Lock()
+
+
+def get_entity_ann_index(db_config: Dict, version: str,
+                         path: str = ENTITY_ANN_INDEX_DIR) -> Optional[EntityAnnIndex]:
+    """
+    Returns the in-process index if it is enabled and was built for this
+    database, vector index and graph version; otherwise None, and seed
+    lookups fall back to the Neo4j vector index.
+    """
+    if not path:
+        return None
+    try:
+        mtime = os.stat(os.path.join(path, "meta.json")).st_mtime
+    except OSError:
+        return None
+    with _loaded_lock:
+        loaded = _loaded.get(path)
+        if loaded is None or loaded[0] != mtime:
+            try:
+                loaded = (mtime, EntityAnnIndex(path))
+            except (OSError, ValueError, KeyError):
+                return None
+            _loaded[path] = loaded
+    index = loaded[1]
+    if (index.meta["database"] != db_identity(db_config)
+            or index.meta["index_name"] != db_config.get("index_name", "entity")
+            or index.meta["version"] != version):
+        return None
+    return index
@@ -0,0 +1,507 @@
+import os
+import re
+import sys
+import tempfile
+import time
+from typing import Dict, Iterator, List, Set, Tuple
+import numpy as np
+import pandas as pd
+from knowledge_graph_creator import (
+    DB_CONFIG,
+    build_entity_contexts,
+    community_hierarchy,
+    community_memberships,
+    create_constraints,
+    create_fulltext_index,
+    create_vector_index,
+    entity_ids_by_name,
+    entity_rows,
+    import_hashes,
+    iter_parquet,
+    load_import_tables,
+    process_community_embeddings,
+    process_entity_embeddings,
+    relationship_endpoints,
+    resolve_relationships,
+)
+from import_manifest import save_manifest
+from neo4j_drivers import get_driver
+from ann_index import refresh_entity_ann_index
+from search_cache import content_hash, db_identity, get_map_result_cache, invalidate_search_cache
+
+# neo4j-admin separates array elements inside one CSV field with this
+ARRAY_DELIMITER = ";"
+
+# CSV header type suffix per Python value type (strings need none)
+CSV_TYPES = {bool: "boolean", int: "long", float: "double", str: ""}
+
+# How neo4j-admin reads a field of each header type
+CSV_PARSERS = {"": str, "string": str, "long": int, "double": float, "boolean": lambda text: text.lower() == "true"}
+
+
+def upper_camel_case(text: str) -> str:
+    """
+    Same result as apoc.text.upperCamelCase, used for entity type labels.
+
+    APOC splits on (\\s|[^\\p{Alnum}])+, and Java's \\p{Alnum} is ASCII
+    letters and digits, so "_" and non-ASCII letters separate words there
+    too. bulk_import_test() compares the labels with an online import.
+    """
+    words = [word for word in re.split(r"[\W_]+", text, flags=re.ASCII) if word]
+    return "".join(word[0].upper() + word[1:].lower() for word in words)
+
+
+def _plain(value):
+    """Converts parquet/numpy values to plain Python, with NaN as None"""
+    if isinstance(value, np.ndarray):
+        return [_plain(item) for item in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
+
+
+def _community_id(community) -> str:
+    # Community keys keep their parquet type (str ids vs int community numbers)
+    return f"{type(community).__name__}:{community}"
+
+
+def _csv_type(value) -> str:
+    if isinstance(value, list):
+        items = [item for item in value if item is not None]
+        return ((CSV_TYPES.get(type(items[0])) if items else None) or "string") + "[]"
+    return CSV_TYPES.get(type(value), "")
+
+
+def _column_types(series: pd.Series) -> pd.Series:
+    """CSV header type of every value of a column, None where the value is unset"""
+    if pd.api.types.is_bool_dtype(series.dtype):
+        csv_type = "boolean"
+    elif pd.api.types.is_integer_dtype(series.dtype):
+        csv_type = "long"
+    elif pd.api.types.is_float_dtype(series.dtype):
+        csv_type = "double"
+    else:
+        return series.map(lambda value: None if _plain(value) is None else _csv_type(_plain(value)))
+    return pd.Series(csv_type, index=series.index).where(series.notna())
+
+
+def _typed_parts(frame: pd.DataFrame, columns: List[str]) -> Iterator[Tuple[Dict[str, str], pd.DataFrame]]:
+    """
+    Splits a frame so every CSV file has one type per column, yielding the
+    column types with each part.
+
+    Columns only change type across parquet files (e.g. community ids that
+    are strings in communities.parquet and ints in community_reports), so
+    this normally yields the whole frame.
+    """
+    types = pd.DataFrame({column: _column_types(frame[column]) for column in columns}, index=frame.index)
+    mixed = [column for column in columns if types[column].dropna().nunique() > 1]
+    groups = types.groupby(mixed, dropna=False).groups.values() if mixed else [frame.index]
+    for index in groups:
+        part_types = types.loc[index]
+        yield ({column: next(iter(part_types[column].dropna()), "") for column in columns},
+               frame.loc[index])
+
+
+def _quoted(text: pd.Series) -> pd.Series:
+    return '"' + text.str.replace('"', '""', regex=False) + '"'
+
+
+def _array_field(value) -> str:
+    items = [str(item).lower() if isinstance(item, bool) else str(item)
+             for item in _plain(value) if item is not None]
+    if any(ARRAY_DELIMITER in item for item in items):
+        raise ValueError(f"Array value contains the array delimiter {ARRAY_DELIMITER!r}: {items}")
+    return ARRAY_DELIMITER.join(items)
+
+
+def _csv_column(series: pd.Series, csv_type: str) -> pd.Series:
+    """
+    Formats a column whose values all have csv_type. Unset values become
+    unquoted empty fields, which neo4j-admin leaves unset; strings and
+    arrays are quoted, so an empty one stays empty rather than unset.
+    """
+    values = series[series.notna()]
+    if csv_type == "boolean":
+        text = values.map(lambda value: "true" if value else "false")
+    elif csv_type in ("long", "double"):
+        text = values.map(lambda value: repr(_plain(value))) if values.dtype == object else values.astype(str)
+    elif csv_type.endswith("[]"):
+        text = _quoted(values.map(_array_field))
+    else:
+        text = _quoted(values.astype(str))
+    return text.reindex(series.index, fill_value="")
+
+
+class ImportFiles:
+    """
+    neo4j-admin import CSVs written one frame at a time, each file with its
+    header on the first line.
+
+    Node frames have an _id column (unique within the id space) and an
+    _labels column (labels joined by ARRAY_DELIMITER); relationship frames
+    have _start and _end columns. Every other column is a property.
+
+    Args:
+        output_dir: Folder for the CSV files
+    """
+
+    def __init__(self, output_dir: str):
+        os.makedirs(output_dir, exist_ok=True)
+        self.output_dir = output_dir
+        self.files = {"nodes": [], "relationships": []}
+        self.counts = {"nodes": 0, "relationships": 0}
+
+    def _write(self, kind: str, name: str, frame: pd.DataFrame,
+               leading: List[Tuple[str, str]], trailing: List[Tuple[str, str]]):
+        # leading/trailing: (header, frame column) of the id, label and type fields
+        special = [column for _, column in leading + trailing]
+        properties = [column for column in frame.columns if column not in special]
+        for types, part in _typed_parts(frame, properties):
+            header = ([field for field, _ in leading]
+                      + [f"{column}:{csv_type}" if csv_type else column for column, csv_type in types.items()]
+                      + [field for field, _ in trailing])
+            fields = ([_csv_column(part[column], "") for _, column in leading]
+                      + [_csv_column(part[column], csv_type) for column, csv_type in types.items()]
+                      + [_csv_column(part[column], "") for _, column in trailing])
+            path = os.path.join(self.output_dir, f"{kind}_{name}_{len(self.files[kind])}.csv")
+            with open(path, "w", encoding="utf-8", newline="") as f:
+                f.write(",".join(header) + "\n")
+                f.write("\n".join(fields[0].str.cat(fields[1:], sep=",")) + "\n")
+            self.files[kind].append(path)
+            self.counts[kind] += len(part)
+
+    def nodes(self, space: str, frame: pd.DataFrame):
+        if len(frame):
+            self._write("nodes", space.lower(), frame, [(f":ID({space})", "_id")], [(":LABEL", "_labels")])
+
+    def relationships(self, rel_type: str, start_space: str, end_space: str, frame: pd.DataFrame):
+        frame = frame.drop_duplicates(["_start", "_end"])
+        if len(frame):
+            self._write("relationships", f"{rel_type.lower()}_{start_space.lower()}", frame.assign(_type=rel_type),
+                        [(f":START_ID({start_space})", "_start"), (f":END_ID({end_space})", "_end")],
+                        [(":TYPE", "_type")])
+
+
+def _first_rows(df: pd.DataFrame, key: str, seen: Set) -> pd.DataFrame:
+    """Rows whose key was not written yet, adding their keys to seen"""
+    df = df[df[key].notna() & ~df[key].map(seen.__contains__).astype(bool)].drop_duplicates(key)
+    seen.update(df[key])
+    return df
+
+
+def _links(df: pd.DataFrame, source: str, targets: str, existing: Set) -> pd.DataFrame:
+    """(_start, _end) pairs from a column of target id arrays, keeping targets that exist"""
+    links = df[[source, targets]].explode(targets).dropna()
+    links = links[links[targets].map(existing.__contains__).astype(bool)]
+    return links.set_axis(["_start", "_end"], axis=1).reset_index(drop=True)
+
+
+def write_import_files(graph_folder: str, output_dir: str) -> ImportFiles:
+    """
+    Writes the graph the online importer would create as neo4j-admin
+    import CSVs, streaming each parquet file one record batch at a time.
+
+    Every MERGE/MATCH of knowledge_graph_creator is mirrored here: entities
+    are keyed by name and relationships by their endpoint names, keeping
+    the first id, links to documents, chunks and entities are only kept
+    when their target exists and community membership is derived from the
+    relationships each community contains. Only the keys written so far
+    are held in memory. GraphRAG keys are unique; a repeated one keeps its
+    first row, since neo4j-admin needs unique node ids.
+
+    Args:
+        graph_folder: GraphRAG project folder containing output/*.parquet
+        output_dir: Folder for the CSV files
+
+    Returns:
+        The ImportFiles written
+    """
+    files = ImportFiles(output_dir)
+
+    documents = set()
+    for df in iter_parquet(graph_folder, "documents", ["id", "title"]):
+        df = _first_rows(df, "id", documents)
+        files.nodes("Document", df.assign(_id=df["id"], _labels="__Document__"))
+
+    chunks = set()
+    for df in iter_parquet(graph_folder, "text_units", ["id", "text", "n_tokens", "document_ids"]):
+        df = _first_rows(df, "id", chunks)
+        files.nodes("Chunk", df[["id", "text", "n_tokens"]].assign(_id=df["id"], _labels="__Chunk__"))
+        files.relationships("PART_OF", "Chunk", "Document", _links(df, "id", "document_ids", documents))
+
+    ids = entity_ids_by_name(graph_folder)
+    names = set()
+    for df in iter_parquet(graph_folder, "entities",
+                           ["id", "human_readable_id", "title", "type", "description", "text_unit_ids"]):
+        df = _first_rows(entity_rows(df), "name", names)
+        type_labels = df["type"].fillna("").str.replace('"', '', regex=False).map(upper_camel_case)
+        files.nodes("Entity", df[["id", "human_readable_id", "description", "name"]].assign(
+            _id=df["id"], _labels=("__Entity__" + ARRAY_DELIMITER + type_labels).where(type_labels != "", "__Entity__")))
+        links = _links(df, "id", "text_unit_ids", chunks)
+        files.relationships("HAS_ENTITY", "Chunk", "Entity", links.rename(columns={"_start": "_end", "_end": "_start"}))
+
+    pairs = set()
+    for df in iter_parquet(graph_folder, "relationships",
+                           ["id", "human_readable_id", "source", "target", "description", "weight", "text_unit_ids"]):
+        df = _first_rows(resolve_relationships(df, ids), "pair", pairs)
+        files.relationships("RELATED", "Entity", "Entity",
+                            df[["id", "weight", "human_readable_id", "description", "text_unit_ids"]].assign(
+                                _start=df["source_id"], _end=df["target_id"]))
+
+    # Communities and reports are small: one row per community
+    community_df = pd.concat(iter_parquet(graph_folder, "communities", ["id", "level", "title", "relationship_ids"]),
+                             ignore_index=True)
+    report_df = pd.concat(iter_parquet(graph_folder, "community_reports",
+                                       ["community", "level", "title", "summary", "findings",
+                                        "rank", "rating_explanation", "full_content"]),
+                          ignore_index=True).drop_duplicates("community", keep="last").reset_index(drop=True)
+    community_nodes = pd.concat([
+        community_df[["id", "level", "title"]].rename(columns={"id": "community"}),
+        report_df[["community", "level", "title", "rank", "rating_explanation", "full_content", "summary"]],
+    ], ignore_index=True)
+    community_nodes["_id"] = community_nodes["community"].map(_community_id)
+    # Both stages SET level and title on the same node; report values win
+    community_nodes = community_nodes.groupby("_id", sort=False).last().reset_index()
+    files.nodes("Community", community_nodes.assign(_labels="__Community__"))
+
+    memberships = community_memberships(community_df, relationship_endpoints(graph_folder))
+    files.relationships("IN_COMMUNITY", "Entity", "Community", pd.DataFrame({
+        "_start": memberships["entity"].map(ids), "_end": memberships["community"].map(_community_id)}).dropna())
+
+    findings = report_df[["community", "findings"]].explode("findings")
+    findings["idx"] = findings.groupby(level=0).cumcount()
+    findings = findings[findings["findings"].notna()].reset_index(drop=True)
+    report_ids = findings["community"].map(_community_id)
+    finding_ids = report_ids + "/" + findings["idx"].astype(str)
+    files.nodes("Finding", pd.DataFrame(findings["findings"].tolist()).assign(
+        id=findings["idx"], _id=finding_ids, _labels="Finding"))
+    files.relationships("HAS_FINDING", "Community", "Finding", pd.DataFrame({"_start": report_ids, "_end": finding_ids}))
+
+    community_ids = set(community_nodes["_id"])
+    hierarchy = community_hierarchy(graph_folder)
+    links = pd.DataFrame({"_start": hierarchy["parent"].map(lambda value: _community_id(_plain(value))),
+                          "_end": hierarchy["child"].map(lambda value: _community_id(_plain(value)))})
+    files.relationships("HAS_CHILD", "Community", "Community",
+                        links[links["_start"].isin(community_ids) & links["_end"].isin(community_ids)])
+
+    return files
+
+
+def import_command(files: Dict[str, List[str]], database: str = DB_CONFIG["database"]) -> str:
+    """The neo4j-admin command that loads the CSVs into an empty (stopped) database"""
+    args = ["neo4j-admin database import full", database, "--overwrite-destination=true",
+            "--multiline-fields=true", f"--array-delimiter='{ARRAY_DELIMITER}'"]
+    args += [f"--nodes={path}" for path in files["nodes"]]
+    args += [f"--relationships={path}" for path in files["relationships"]]
+    return " \\\n    ".join(args)
+
+
+def export_bulk_import(graph_folder: str, output_dir: str = None) -> str:
+    """
+    Bulk-load fast path: writes the GraphRAG output as neo4j-admin import
+    CSVs and returns the command to load them.
+
+    neo4j-admin import is offline and skips transactions, so it is much
+    faster than the online importer for a fresh database. Constraints,
+    vector indexes and embeddings are not part of the files; run
+    finish_bulk_import() once the database is started again.
+    """
+    output_dir = output_dir or f"{graph_folder}/import"
+    start_time = time.time()
+    files = write_import_files(graph_folder, output_dir)
+    print(f"{files.counts['nodes']} nodes and {files.counts['relationships']} relationships written to {output_dir} "
+          f"in {time.time() - start_time:.2f} seconds.")
+    return import_command(files.files)
+
+
+
+
+def finish_bulk_import(graph_folder: str):
+    """Creates constraints, vector and full-text indexes, embeddings and neighborhood records after a neo4j-admin import"""
+    create_constraints()
+    create_vector_index()
+    create_fulltext_index()
+    build_entity_contexts()
+    process_community_embeddings()
+    process_entity_embeddings(source="database")
+
+    reports = pd.read_parquet(f'{graph_folder}/output/community_reports.parquet', columns=["community", "full_content"])
+    get_map_result_cache().invalidate_changed(db_identity(DB_CONFIG), {
+        str(community): content_hash(full_content)
+        for community, full_content in zip(reports["community"], reports["full_content"])
+    })
+    invalidate_search_cache(DB_CONFIG)
+    refresh_entity_ann_index(DB_CONFIG)
+    # Baseline for later delta imports
+    save_manifest(graph_folder, db_identity(DB_CONFIG), import_hashes(load_import_tables(graph_folder)))
+
+
+# Node properties the online importer derives after loading, which the bulk
+# graph does not have
+DERIVED_PROPERTIES = ("neighborhood",)
+
+
+def _kept_properties(properties: Dict) -> Dict:
+    return {key: value for key, value in properties.items()
+            if not key.endswith("_embedding") and key not in DERIVED_PROPERTIES}
+
+
+def _csv_records(path: str) -> Iterator[List[Tuple[str, bool]]]:
+    """Records of an import CSV as (text, quoted) fields, quoted fields may span lines"""
+    with open(path, encoding="utf-8", newline="") as f:
+        text = f.read()
+    record, i = [], 0
+    while i < len(text):
+        if text[i] == '"':
+            parts, j = [], i + 1
+            while True:
+                end = text.index('"', j)
+                parts.append(text[j:end])
+                if text[end + 1:end + 2] != '"':
+                    break
+                parts.append('"')
+                j = end + 2
+            record.append(("".join(parts), True))
+            i = end + 1
+        else:
+            end = i
+            while end < len(text) and text[end] not in ",\n":
+                end += 1
+            record.append((text[i:end], False))
+            i = end
+        if i >= len(text) or text[i] == "\n":
+            yield record
+            record = []
+        i += 1
+
+
+def _csv_value(text: str, csv_type: str):
+    if csv_type.endswith("[]"):
+        parse = CSV_PARSERS[csv_type[:-2]]
+        return [parse(item) for item in text.split(ARRAY_DELIMITER)] if text else []
+    return CSV_PARSERS[csv_type](text)
+
+
+def _csv_rows(path: str) -> Iterator[Dict]:
+    """Fields of every row of an import CSV as neo4j-admin reads them, without unset ones"""
+    records = _csv_records(path)
+    header = [column for column, _ in next(records)]
+    for record in records:
+        row = {}
+        for column, (text, quoted) in zip(header, record):
+            if not text and not quoted:
+                continue
+            if column.startswith(":"):
+                row[column.split("(")[0]] = (column[column.index("(") + 1:-1], text) if "(" in column else text
+            else:
+                name, _, csv_type = column.partition(":")
+                row[name] = _csv_value(text, csv_type)
+        yield row
+
+
+def read_import_files(files: Dict[str, List[str]]) -> Tuple[Dict, Dict]:
+    """
+    Reads import CSVs back the way neo4j-admin loads them: nodes keyed by
+    (id space, id) with their labels and properties, and relationships
+    keyed by (type, start, end) plus the id of RELATED ones, with their
+    properties.
+    """
+    node_records, rel_records = {}, {}
+    for path in files["nodes"]:
+        for row in _csv_rows(path):
+            key = row.pop(":ID")
+            if key in node_records:
+                raise ValueError(f"Duplicate node id {key} in {path}")
+            node_records[key] = {"labels": set(row.pop(":LABEL", "").split(ARRAY_DELIMITER)) - {""},
+                                 "properties": row}
+    for path in files["relationships"]:
+        for row in _csv_rows(path):
+            key = (row.pop(":TYPE"), row.pop(":START_ID"), row.pop(":END_ID"))
+            if key[0] == "RELATED":
+                key += (row.get("id"),)
+            if key in rel_records:
+                raise ValueError(f"Duplicate relationship {key} in {path}")
+            rel_records[key] = row
+    return node_records, rel_records
+
+
+def _node_key(labels: List[str], properties: Dict, finding_of) -> Tuple[str, str]:
+    # The id spaces write_import_files() uses, derived from a database node
+    for label, space in (("__Document__", "Document"), ("__Chunk__", "Chunk"), ("__Entity__", "Entity")):
+        if label in labels:
+            return space, properties.get("id")
+    if "__Community__" in labels:
+        return "Community", _community_id(properties.get("community"))
+    if "Finding" in labels:
+        return "Finding", f"{_community_id(finding_of)}/{properties.get('id')}"
+    return "Other", str(properties)
+
+
+def database_records() -> Tuple[Dict, Dict]:
+    """read_import_files() records of the graph in DB_CONFIG, ignoring embeddings, neighborhood records and bookkeeping nodes"""
+    driver = get_driver(DB_CONFIG)
+    records, _, _ = driver.execute_query("""
+        MATCH (n) WHERE NOT n:__GraphVersion__
+        OPTIONAL MATCH (c:__Community__)-[:HAS_FINDING]->(n)
+        RETURN elementId(n) AS element, labels(n) AS labels, properties(n) AS properties,
+               c.community AS finding_of
+    """, database_=DB_CONFIG["database"])
+    keys, node_records = {}, {}
+    for record in records:
+        key = _node_key(record["labels"], record["properties"], record["finding_of"])
+        keys[record["element"]] = key
+        node_records[key] = {"labels": set(record["labels"]), "properties": _kept_properties(record["properties"])}
+
+    records, _, _ = driver.execute_query("""
+        MATCH (a)-[r]->(b) WHERE NOT a:__GraphVersion__ AND NOT b:__GraphVersion__
+        RETURN elementId(a) AS start, type(r) AS type, elementId(b) AS end, properties(r) AS properties
+    """, database_=DB_CONFIG["database"])
+    rel_records = {}
+    for record in records:
+        key = (record["type"], keys[record["start"]], keys[record["end"]])
+        if record["type"] == "RELATED":
+            key += (record["properties"].get("id"),)
+        rel_records[key] = record["properties"]
+    return node_records, rel_records
+
+
+def _compare(kind: str, expected: Dict, actual: Dict, max_reported: int) -> int:
+    differences = 0
+    for key in sorted(set(expected) | set(actual), key=repr):
+        online, bulk = expected.get(key), actual.get(key)
+        if online != bulk:
+            differences += 1
+            if differences <= max_reported:
+                print(f"{kind} {key}: online={online} bulk={bulk}")
+    if differences > max_reported:
+        print(f"... {differences - max_reported} more {kind} differences")
+    return differences
+
+
+
+def bulk_import_test(graph_folder: str = "ragtest", max_reported: int = 20) -> bool:
+    """
+    Checks that the bulk-load path produces the same graph as the online
+    importer: writes the import CSVs, reads them back as neo4j-admin would
+    and compares every node with its labels and properties, and every
+    relationship with its endpoints and properties, with the database.
+    Run knowledge_graph_creator.py against DB_CONFIG first.
+    """
+    expected_nodes, expected_rels = database_records()
+    with tempfile.TemporaryDirectory(prefix="bulk_import_") as output_dir:
+        actual_nodes, actual_rels = read_import_files(write_import_files(graph_folder, output_dir).files)
+
+    differences = (_compare("node", expected_nodes, actual_nodes, max_reported)
+                   + _compare("relationship", expected_rels, actual_rels, max_reported))
+    print(f"Compared {len(expected_nodes)} nodes and {len(expected_rels)} relationships")
+    print("Bulk import matches the online import" if not differences
+          else f"Bulk import differs from the online import in {differences} nodes or relationships")
+    return not differences
+
+
+if __name__ == "__main__":
+    graph_folder = sys.argv[1] if len(sys.argv) > 1 else "ragtest"
+    print(export_bulk_import(graph_folder))
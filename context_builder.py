@@ -0,0 +1,121 @@
+import os
+from functools import lru_cache
+from typing import Dict, List
+import tiktoken
+
+# Tokenizer used for all prompt budgeting (cl100k/o200k match the GPT-4 family)
+TOKEN_ENCODING = os.getenv("TOKEN_ENCODING", "cl100k_base")
+
+# Order in which local search context sections claim the token budget
+LOCAL_SECTION_PRIORITY = ["Entities", "Relationships", "Reports", "Chunks"]
+
+REPORT_SEPARATOR = "\n\n-----\n\n"
+
+
+@lru_cache(maxsize=None)
+def get_tokenizer(encoding_name: str = TOKEN_ENCODING) -> tiktoken.Encoding:
+    """Returns the tokenizer, loading its BPE ranks only once per process"""
+    return tiktoken.get_encoding(encoding_name)
+
+
+@lru_cache(maxsize=8192)
+def count_tokens(text: str) -> int:
+    """Number of tokens in text. Cached, since community reports recur across queries."""
+    return len(get_tokenizer().encode(text, disallowed_special=()))
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cuts text down to at most max_tokens tokens"""
+    if count_tokens(text) <= max_tokens:
+        return text
+    tokenizer = get_tokenizer()
+    return tokenizer.decode(tokenizer.encode(text, disallowed_special=())[:max_tokens])
+
+
+def pack_report_batches(reports: List[str], max_tokens: int) -> List[List[int]]:
+    """
+    Greedily groups reports into as few map contexts as fit in max_tokens each.
+
+    Reports keep their order; a report larger than the limit is sent on its
+    own (and truncated by pack_reports).
+
+    Args:
+        reports: Report texts, most relevant first
+        max_tokens: Token limit per packed context
+
+    Returns:
+        Indices into reports, one list per map call
+    """
+    separator_tokens = count_tokens(REPORT_SEPARATOR)
+    batches, current, current_tokens = [], [], 0
+
+    for i, report in enumerate(reports):
+        if not report:
+            continue
+        tokens = min(count_tokens(report), max_tokens)
+        if current and current_tokens + separator_tokens + tokens > max_tokens:
+            batches.append(current)
+            current, current_tokens = [], 0
+        current_tokens += tokens + (separator_tokens if current else 0)
+        current.append(i)
+
+    if current:
+        batches.append(current)
+    return batches
+
+
+def join_reports(reports: List[str], max_tokens: int) -> str:
+    """Joins one batch of reports into a map context, truncating oversized reports"""
+    return REPORT_SEPARATOR.join(truncate_to_tokens(report, max_tokens) for report in reports)
+
+
+def pack_reports(reports: List[str], max_tokens: int) -> List[str]:
+    """Packs reports into map context strings of at most max_tokens each"""
+    return [
+        join_reports([reports[i] for i in batch], max_tokens)
+        for batch in pack_report_batches(reports, max_tokens)
+    ]
+
+
+def build_local_context(sections: List[Dict], max_tokens: int) -> str:
+    """
+    Builds the local search reduce context within a token budget.
+
+    Sections are filled in LOCAL_SECTION_PRIORITY order, and items within a
+    section keep the ranking the retrieval query gave them. The first item
+    that no longer fits is truncated and filling stops there.
+
+    Args:
+        sections: Retrieval results shaped {"Entities": [...], "Relationships": [...], ...}
+        max_tokens: Token budget for the whole context
+
+    Returns:
+        The context as markdown sections
+    """
+    merged = {name: [] for name in LOCAL_SECTION_PRIORITY}
+    for section in sections:
+        for name in LOCAL_SECTION_PRIORITY:
+            merged[name].extend(item for item in section.get(name) or [] if item)
+
+    parts, remaining = [], max_tokens
+    for name in LOCAL_SECTION_PRIORITY:
+        header = f"-----{name}-----"
+        items = []
+        remaining -= count_tokens(header)
+        for item in merged[name]:
+            item = str(item)
+            tokens = count_tokens(item) + 1
+            if tokens > remaining:
+                # Keep what fits of the first item that overflows, then stop
+                if remaining > 16:
+                    items.append(truncate_to_tokens(item, remaining - 1))
+                remaining = 0
+                break
+            items.append(item)
+            remaining -= tokens
+        if items:
+            parts.append(header + "\n" + "\n".join(items))
+        if remaining <= 0:
+            break
+
+    return "\n\n".join(parts)
@@ -0,0 +1,180 @@
+import os
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from search_cache import normalize_query
+
+# Embedding model used for entity descriptions, community summaries and queries
+EMBEDDING_MODEL = "text-embedding-3-large"
+# Size of the vectors the model returns
+EMBEDDING_MODEL_DIMENSIONS = 3072
+# Size of the vectors stored and indexed in Neo4j. text-embedding-3 models
+# are trained so a prefix of the vector (e.g. 256, 512 or 1024 values),
+# renormalized, is still a usable embedding.
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", str(EMBEDDING_MODEL_DIMENSIONS)))
+
+# Query embeddings: LRU capacity, how long a query waits for others to share
+# its embedding request, and the most queries per request
+QUERY_EMBEDDING_CACHE_ENTRIES = int(os.getenv("QUERY_EMBEDDING_CACHE_ENTRIES", "10000"))
+QUERY_EMBEDDING_BATCH_MS = float(os.getenv("QUERY_EMBEDDING_BATCH_MS", "5"))
+QUERY_EMBEDDING_MAX_BATCH = int(os.getenv("QUERY_EMBEDDING_MAX_BATCH", "64"))
+
+
+def reduce_dimensions(vector: List[float], dimensions: int = EMBEDDING_DIMENSIONS) -> List[float]:
+    """Truncates a vector to its first dimensions values and rescales it to unit length"""
+    if len(vector) <= dimensions:
+        return list(vector)
+    truncated = np.asarray(vector[:dimensions], dtype=np.float64)
+    norm = np.linalg.norm(truncated)
+    return (truncated / norm if norm else truncated).tolist()
+
+
+class ReducedEmbeddings(Embeddings):
+    """
+    Wraps an embeddings client so every vector it returns is reduced to
+    EMBEDDING_DIMENSIONS, matching what the importer writes and indexes.
+
+    Args:
+        embeddings: Client returning full-size vectors
+        dimensions: Target size
+    """
+
+    def __init__(self, embeddings: Embeddings, dimensions: int = EMBEDDING_DIMENSIONS):
+        self.embeddings = embeddings
+        self.dimensions = dimensions
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [reduce_dimensions(vector, self.dimensions) for vector in self.embeddings.embed_documents(texts)]
+
+    def embed_query(self, text: str) -> List[float]:
+        return reduce_dimensions(self.embeddings.embed_query(text), self.dimensions)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [reduce_dimensions(vector, self.dimensions)
+                for vector in await self.embeddings.aembed_documents(texts)]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return reduce_dimensions(await self.embeddings.aembed_query(text), self.dimensions)
+
+
+class QueryEmbeddings(Embeddings):
+    """
+    Query embeddings with an LRU cache keyed by normalized query text, and
+    micro-batching of async queries.
+
+    An uncached aembed_query() waits up to batch_ms for other queries on the
+    same event loop, and they are embedded together with one
+    embed_documents request. Calls for a normalized text that is already
+    waiting or being embedded share that request. Document embedding
+    passes straight through.
+
+    Args:
+        embeddings: Client the queries are embedded with
+        max_entries: LRU capacity (0 disables caching)
+        batch_ms: Milliseconds a batch stays open
+        max_batch: Queries that close a batch early
+    """
+
+    def __init__(self, embeddings: Embeddings, max_entries: int = QUERY_EMBEDDING_CACHE_ENTRIES,
+                 batch_ms: float = QUERY_EMBEDDING_BATCH_MS, max_batch: int = QUERY_EMBEDDING_MAX_BATCH):
+        self.embeddings = embeddings
+        self.max_entries = max_entries
+        self.batch_seconds = batch_ms / 1000
+        self.max_batch = max_batch
+        self.metrics = {"hits": 0, "misses": 0, "requests": 0, "batched_queries": 0}
+        self._entries: "OrderedDict[str, Tuple[float, ...]]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Open batch per event loop ({normalized text: text}), and the result
+        # every queued or in-flight text will get
+        self._pending: Dict[asyncio.AbstractEventLoop, Dict[str, str]] = {}
+        self._futures: Dict[Tuple[asyncio.AbstractEventLoop, str], asyncio.Future] = {}
+        self._tasks = set()
+
+    def _get(self, key: str) -> Optional[List[float]]:
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.metrics["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.metrics["hits"] += 1
+            return list(vector)
+
+    def _put(self, key: str, vector: List[float]):
+        if not self.max_entries:
+            return
+        with self._lock:
+            self._entries[key] = tuple(vector)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await self.embeddings.aembed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        key = normalize_query(text)
+        vector = self._get(key)
+        if vector is None:
+            vector = self.embeddings.embed_query(text)
+            self.metrics["requests"] += 1
+            self._put(key, vector)
+        return vector
+
+    async def aembed_query(self, text: str) -> List[float]:
+        key = normalize_query(text)
+        vector = self._get(key)
+        if vector is not None:
+            return vector
+
+        loop = asyncio.get_running_loop()
+        future = self._futures.get((loop, key))
+        if future is None:
+            batch = self._pending.get(loop)
+            if batch is None:
+                batch = self._pending[loop] = {}
+                loop.call_later(self.batch_seconds, self._flush, loop, batch)
+            batch[key] = text
+            future = self._futures[(loop, key)] = loop.create_future()
+            if len(batch) >= self.max_batch:
+                self._flush(loop, batch)
+        # A cancelled caller must not cancel the request others wait on
+        return list(await asyncio.shield(future))
+
+    def _flush(self, loop: asyncio.AbstractEventLoop, batch: Dict[str, str]):
+        # The timer of a batch that already closed early finds another one open
+        if self._pending.get(loop) is batch:
+            del self._pending[loop]
+            task = loop.create_task(self._embed_batch(loop, batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _embed_batch(self, loop: asyncio.AbstractEventLoop, batch: Dict[str, str]):
+        self.metrics["requests"] += 1
+        self.metrics["batched_queries"] += len(batch)
+        futures = [self._futures[(loop, key)] for key in batch]
+        try:
+            vectors = await self.embeddings.aembed_documents(list(batch.values()))
+        except BaseException as e:
+            # Waiters get the error, including the batch task's cancellation
+            for future in futures:
+                if not future.done():
+                    if isinstance(e, asyncio.CancelledError):
+                        future.cancel()
+                    else:
+                        future.set_exception(e)
+            if isinstance(e, Exception):
+                return
+            raise
+        finally:
+            for key in batch:
+                del self._futures[(loop, key)]
+        for key, future, vector in zip(batch, futures, vectors):
+            self._put(key, vector)
+            future.set_result(vector)
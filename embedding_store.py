@@ -0,0 +1,75 @@
+import os
+import hashlib
+import sqlite3
+import threading
+from functools import lru_cache
+from typing import Dict, List, Optional
+import numpy as np
+
+# Local embedding store; set EMBEDDING_STORE_PATH to an empty string to disable it
+EMBEDDING_STORE_PATH = os.getenv("EMBEDDING_STORE_PATH", "embedding_store.sqlite")
+
+
+def text_hash(text: str) -> str:
+    """Hash of the exact text sent to the embedding model"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """
+    SQLite store of embeddings keyed by model (name + dimensions) and text hash.
+
+    GraphRAG assigns new entity ids on every re-index, but unchanged
+    descriptions hash the same, so their vectors can be reused without
+    calling the provider again.
+
+    Args:
+        path: SQLite file
+    """
+
+    def __init__(self, path: str = EMBEDDING_STORE_PATH):
+        self.metrics = {"hits": 0, "misses": 0}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT, hash TEXT, vector BLOB,
+                PRIMARY KEY (model, hash)
+            )
+            """
+        )
+        self._db.commit()
+
+    def get_many(self, model: str, hashes: List[str]) -> Dict[str, List[float]]:
+        """Returns {hash: vector} for the hashes already stored for model"""
+        found = {}
+        with self._lock:
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(hashes), 500):
+                chunk = hashes[start:start + 500]
+                rows = self._db.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({','.join('?' * len(chunk))})",
+                    (model, *chunk),
+                ).fetchall()
+                for digest, vector in rows:
+                    found[digest] = np.frombuffer(vector, dtype=np.float32).tolist()
+        self.metrics["hits"] += len(found)
+        self.metrics["misses"] += len(set(hashes)) - len(found)
+        return found
+
+    def put_many(self, model: str, vectors: Dict[str, List[float]]):
+        """Stores {hash: vector} for model"""
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)",
+                [(model, digest, np.asarray(vector, dtype=np.float32).tobytes())
+                 for digest, vector in vectors.items()],
+            )
+            self._db.commit()
+
+
+@lru_cache(maxsize=None)
+def get_embedding_store() -> Optional[EmbeddingStore]:
+    """Returns the per-process embedding store, or None when disabled"""
+    return EmbeddingStore() if EMBEDDING_STORE_PATH else None
@@ -1,37 +1,110 @@
 import os
+import re
+import json
+import heapq
 import asyncio
+import logging
+from functools import lru_cache
 from typing import Dict, List
-from langchain_community.graphs import Neo4jGraph
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import AzureChatOpenAI
+from langchain_openai import AzureChatOpenAI, AzureOpenAIEmbeddings
+from neo4j.exceptions import ClientError
 from dotenv import load_dotenv
 
-# Load environment variables
+# Load environment variables before the modules below read their settings
 load_dotenv()
 
-async def perform_global_search(db_config: Dict, query: str, response_type: str = "multiple paragraphs") -> str:
-    """
-    Performs a global search on the knowledge graph.
-    
-    Args:
-        db_config: Dictionary containing Neo4j connection details (url, username, password)
-        query: The search query
-        response_type: Type of response to generate (default: "multiple paragraphs")
-        
-    Returns:
-        The search results as a string
-    """
-    # Set up Neo4j graph connection
-    graph = Neo4jGraph(
-        url=db_config["url"],
-        username=db_config["username"],
-        password=db_config["password"],
-        refresh_schema=False,
-    )
-    
-    # Define prompts
-    MAP_SYSTEM_PROMPT = """
+from neo4j_drivers import get_async_driver, run_sync
+from rate_limiting import RateLimiter, get_llm_rate_limiter
+from context_builder import count_tokens, join_reports, pack_report_batches
+from embedding_models import QueryEmbeddings, ReducedEmbeddings
+from search_cache import (MapResultCache, SemanticCache, agraph_version, cache_scope, content_hash,
+                          get_map_result_cache, get_search_cache, map_query_key)
+
+logger = logging.getLogger(__name__)
+
+# Completion tokens reserved per call when charging the token bucket
+MAP_RESPONSE_TOKENS = 500
+REDUCE_RESPONSE_TOKENS = 1500
+
+# Communities kept for the map phase after similarity pre-filtering (0 maps all)
+TOP_COMMUNITIES = int(os.getenv("GLOBAL_SEARCH_TOP_COMMUNITIES", "50"))
+# The community index spans all levels, so oversample before filtering on
+# level, widening by the same factor while too few hits are at the level
+COMMUNITY_CANDIDATE_FACTOR = 4
+
+# Streaming reduce: tokens of map points handed to the reduce prompt, the
+# score a point needs to count toward an early exit, and the map deadline
+REDUCE_TOKEN_BUDGET = int(os.getenv("GLOBAL_SEARCH_REDUCE_TOKEN_BUDGET", "8000"))
+EARLY_EXIT_MIN_SCORE = int(os.getenv("GLOBAL_SEARCH_EARLY_EXIT_MIN_SCORE", "60"))
+MAP_DEADLINE_SECONDS = float(os.getenv("GLOBAL_SEARCH_MAP_DEADLINE_SECONDS", "30"))
+
+# Token limit for the community reports packed into a single map call
+MAP_CONTEXT_TOKENS = int(os.getenv("GLOBAL_SEARCH_MAP_CONTEXT_TOKENS", "8000"))
+
+# Drill-down community selection: start at the coarsest level, rate report
+# summaries for relevance (0-5) and only expand the children of communities
+# rated at least DRILL_DOWN_MIN_RATING. DRILL_DOWN_MAX_RATED bounds the
+# communities rated per query. Disabled, or on graphs without HAS_CHILD
+# links, the map runs over GLOBAL_SEARCH_LEVEL.
+DRILL_DOWN = os.getenv("GLOBAL_SEARCH_DRILL_DOWN", "false").lower() in ("1", "true")
+DRILL_DOWN_MIN_RATING = int(os.getenv("GLOBAL_SEARCH_DRILL_DOWN_MIN_RATING", "2"))
+DRILL_DOWN_MAX_RATED = int(os.getenv("GLOBAL_SEARCH_DRILL_DOWN_MAX_RATED", "500"))
+RATE_CONTEXT_TOKENS = int(os.getenv("GLOBAL_SEARCH_RATE_CONTEXT_TOKENS", "4000"))
+RATE_RESPONSE_TOKENS = 200
+SEARCH_LEVEL = int(os.getenv("GLOBAL_SEARCH_LEVEL", "1"))
+
+
+all_communities_query = """
+MATCH (c:__Community__)
+WHERE c.level = $level
+RETURN c.community AS community, c.full_content AS output
+"""
+
+community_count_query = """
+MATCH (c:__Community__)
+RETURN count(c) AS communities
+"""
+
+relevant_communities_query = """
+CALL db.index.vector.queryNodes($index, $candidates, $embedding) YIELD node AS c, score
+WHERE c.level = $level
+RETURN c.community AS community, c.full_content AS output
+ORDER BY round(score, 3) DESC, c.rank DESC
+LIMIT $topCommunities
+"""
+
+community_hierarchy_query = """
+RETURN EXISTS { MATCH (:__Community__)-[:HAS_CHILD]->(:__Community__) } AS hierarchy
+"""
+
+# Communities at the coarsest level that has reports. Drill-down candidates
+# come most similar to the query first (when an $embedding is given, which
+# needs Neo4j 5.18+ for vector.similarity.cosine), then by rank, so
+# truncating them keeps the likeliest ones.
+root_communities_query = """
+MATCH (c:__Community__)
+WHERE c.summary IS NOT NULL
+WITH min(c.level) AS level
+MATCH (c:__Community__)
+WHERE c.level = level AND c.summary IS NOT NULL
+WITH c, vector.similarity.cosine(c.summary_embedding, $embedding) AS score
+RETURN c.community AS community, c.summary AS summary, c.full_content AS output, score
+ORDER BY round(coalesce(score, -1), 3) DESC, c.rank DESC
+"""
+
+child_communities_query = """
+UNWIND $communities AS community
+MATCH (p:__Community__ {community: community})-[:HAS_CHILD]->(c:__Community__)
+WHERE c.summary IS NOT NULL
+WITH p, c, vector.similarity.cosine(c.summary_embedding, $embedding) AS score
+RETURN p.community AS parent, c.community AS community, c.summary AS summary, c.full_content AS output, score
+ORDER BY round(coalesce(score, -1), 3) DESC, c.rank DESC
+"""
+
+
+MAP_SYSTEM_PROMPT = """
     You are a helpful assistant responding to questions about data in the provided tables.
 
     Generate a response consisting of a list of key points that responds to the user's question, summarizing all relevant information in the input data tables.
@@ -68,7 +141,7 @@ async def perform_global_search(db_config: Dict, query: str, response_type: str
     {context_data}
     """
 
-    REDUCE_SYSTEM_PROMPT = """
+REDUCE_SYSTEM_PROMPT = """
     You are a helpful assistant responding to questions about a dataset by synthesizing perspectives from multiple analysts.
 
     Generate a response of the target length and format that responds to the user's question, summarizing all the reports from multiple analysts who focused on different parts of the dataset.
@@ -104,58 +177,459 @@ async def perform_global_search(db_config: Dict, query: str, response_type: str
     {report_data}
     """
 
-    map_prompt = ChatPromptTemplate.from_messages([
-        ("system", MAP_SYSTEM_PROMPT),
-        ("human", "{question}"),
-    ])
+RATE_SYSTEM_PROMPT = """
+    You are a helpful assistant deciding which community reports could help answer the user's question.
 
-    reduce_prompt = ChatPromptTemplate.from_messages([
-        ("system", REDUCE_SYSTEM_PROMPT),
-        ("human", "{question}"),
-    ])
-    
-    # Set up LLM
-    llm = AzureChatOpenAI(
-        azure_deployment=os.getenv("DEPLOYMENT_NAME"),
-        temperature=0,
-    )
-
-    # Create chains
-    map_chain = map_prompt | llm | StrOutputParser()
-    reduce_chain = reduce_prompt | llm | StrOutputParser()
-    
-    # Set level to 1 as required
-    level = 1
-    
-    # Get community data
-    community_data = graph.query(
+    Rate each report summary below from 0 to 5 for how relevant the community it describes is to the question:
+    0 means unrelated, 5 means it directly addresses the question.
+
+    Each summary starts with "Report <id>:". The response should be JSON formatted as follows, with one
+    entry per report, where "id" is the report's id without the "Report" prefix and "rating" is an integer:
+    {{
+        "ratings": [
+            {{"id": "report id", "rating": 0}},
+            {{"id": "another report id", "rating": 5}}
+        ]
+    }}
+
+    ---Report summaries---
+
+    {summaries}
+    """
+
+map_prompt = ChatPromptTemplate.from_messages([
+    ("system", MAP_SYSTEM_PROMPT),
+    ("human", "{question}"),
+])
+
+reduce_prompt = ChatPromptTemplate.from_messages([
+    ("system", REDUCE_SYSTEM_PROMPT),
+    ("human", "{question}"),
+])
+
+rate_prompt = ChatPromptTemplate.from_messages([
+    ("system", RATE_SYSTEM_PROMPT),
+    ("human", "{question}"),
+])
+
+
+def parse_map_points(output: str) -> List[Dict]:
+    """
+    Parses a map response into [{"description", "score"}] points.
+
+    Accepts fenced or bare JSON; an unparsable response is kept as a single
+    low-score point so it can still fill leftover reduce budget.
+    """
+    match = re.search(r"\{.*\}", output, re.DOTALL)
+    try:
+        points = json.loads(match.group(0))["points"] if match else None
+        return [
+            {"description": str(point["description"]), "score": int(point.get("score", 0))}
+            for point in points
+            if point.get("description")
+        ]
+    except (ValueError, KeyError, TypeError, AttributeError):
+        logger.warning("Could not parse map response as JSON points")
+        return [{"description": output, "score": 1}]
+
+
+def report_id(key) -> str:
+    """Normalizes a report id from a rating response ("Report 12", "#12", 12) to the community id"""
+    return re.sub(r"^(report)?\s*(id)?\s*[#:]?\s*", "", str(key).strip(), flags=re.IGNORECASE)
+
+
+def parse_ratings(output: str) -> Dict[str, int]:
+    """
+    Parses a rating response into {report id: rating}.
+
+    Accepts the requested [{"id", "rating"}] list as well as an
+    {id: rating} object; unparsable responses rate nothing.
+    """
+    match = re.search(r"\{.*\}", output, re.DOTALL)
+    try:
+        ratings = json.loads(match.group(0))["ratings"] if match else {}
+        if isinstance(ratings, dict):
+            ratings = [{"id": community, "rating": rating} for community, rating in ratings.items()]
+        return {report_id(rating["id"]): int(rating["rating"]) for rating in ratings}
+    except (ValueError, KeyError, TypeError, AttributeError):
+        logger.warning("Could not parse rating response as JSON ratings")
+        return {}
+
+
+class ScoredPointHeap:
+    """
+    Keeps the highest-scoring map points that fit in a token budget.
+
+    Points are held in a min-heap on score, so the weakest point is evicted
+    first when a new point would exceed the budget.
+    """
+
+    def __init__(self, token_budget: int):
+        self.token_budget = token_budget
+        self.tokens = 0
+        self._heap = []
+        self._counter = 0
+
+    def add(self, point: Dict):
+        if point["score"] <= 0:
+            # "I don't know" answers carry no information
+            return
+        tokens = count_tokens(point["description"])
+        self._counter += 1
+        heapq.heappush(self._heap, (point["score"], self._counter, tokens, point))
+        self.tokens += tokens
+        while self.tokens > self.token_budget and len(self._heap) > 1:
+            _, _, evicted_tokens, _ = heapq.heappop(self._heap)
+            self.tokens -= evicted_tokens
+
+    def is_full_of(self, min_score: int) -> bool:
+        """True once the budget is filled and every kept point scores min_score or more"""
+        return (
+            bool(self._heap)
+            and self.tokens >= self.token_budget * 0.9
+            and self._heap[0][0] >= min_score
+        )
+
+    def __len__(self):
+        return len(self._heap)
+
+    def report_data(self) -> str:
+        """Formats kept points for the reduce prompt, most important first"""
+        ranked = sorted(self._heap, key=lambda item: (-item[0], item[1]))
+        return "\n\n".join(
+            f"----Analyst {i}----\nImportance Score: {score}\n{point['description']}"
+            for i, (score, _, _, point) in enumerate(ranked, start=1)
+        )
+
+
+class GlobalSearchEngine:
+    """
+    Map-reduce global search with its LLM and chains built once.
+
+    A warm instance is meant to be shared by every request in the process.
+    """
+
+    def __init__(self, llm=None, embeddings=None, rate_limiter: RateLimiter = None,
+                 top_communities: int = TOP_COMMUNITIES,
+                 reduce_token_budget: int = REDUCE_TOKEN_BUDGET,
+                 map_deadline: float = MAP_DEADLINE_SECONDS,
+                 map_context_tokens: int = MAP_CONTEXT_TOKENS,
+                 cache: SemanticCache = None,
+                 map_cache: MapResultCache = None,
+                 drill_down: bool = DRILL_DOWN):
+        # Set up LLM; retries are handled by the rate limiter, not the client
+        self.llm = llm or AzureChatOpenAI(
+            azure_deployment=os.getenv("DEPLOYMENT_NAME"),
+            temperature=0,
+            max_retries=0,
+        )
+        self.embeddings = QueryEmbeddings(ReducedEmbeddings(embeddings or AzureOpenAIEmbeddings(
+            model=os.getenv("DEPLOYMENT_NAME_EMBEDDINGS"),
+            api_key=os.getenv("AZURE_OPENAI_API_KEY_EMBEDDINGS"),
+        )))
+        self.top_communities = top_communities
+        self.reduce_token_budget = reduce_token_budget
+        self.map_deadline = map_deadline
+        self.map_context_tokens = map_context_tokens
+        self.drill_down = drill_down
+        self.cache = cache or get_search_cache()
+        self.map_cache = map_cache or get_map_result_cache()
+        self.model_name = os.getenv("DEPLOYMENT_NAME", "default")
+        self.rate_limiter = rate_limiter or get_llm_rate_limiter()
+
+        # Create chains
+        self.map_chain = map_prompt | self.llm | StrOutputParser()
+        self.reduce_chain = reduce_prompt | self.llm | StrOutputParser()
+        self.rate_chain = rate_prompt | self.llm | StrOutputParser()
+
+    async def rate_communities(self, query: str, communities: List[Dict]) -> List[int]:
+        """
+        Rates each community's summary for relevance to the query, with as
+        many summaries per LLM call as fit in RATE_CONTEXT_TOKENS.
+        Communities whose rating is missing or whose call failed rate 0.
+        """
+        summaries = [f"Report {community['community']}: {community['summary']}" for community in communities]
+
+        async def rate(batch):
+            context = join_reports([summaries[i] for i in batch], RATE_CONTEXT_TOKENS)
+            inputs = {"question": query, "summaries": context}
+            return parse_ratings(await self.rate_limiter.call(
+                lambda: self.rate_chain.ainvoke(inputs),
+                tokens=count_tokens(RATE_SYSTEM_PROMPT + query + context) + RATE_RESPONSE_TOKENS,
+            ))
+
+        batches = pack_report_batches(summaries, RATE_CONTEXT_TOKENS)
+        results = await asyncio.gather(*[rate(batch) for batch in batches], return_exceptions=True)
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors:
+            logger.warning(f"{len(errors)}/{len(batches)} community rating calls failed and rated 0")
+            if len(errors) == len(batches):
+                raise errors[0]
+        ratings = {}
+        for result in results:
+            if not isinstance(result, Exception):
+                ratings.update(result)
+        return [ratings.get(report_id(community["community"]), 0) for community in communities]
+
+    async def drill_down_communities(self, db_config: Dict, query: str, embedding: List[float]) -> List[Dict]:
+        """
+        Selects the community reports to map over by walking the community
+        hierarchy from its coarsest level.
+
+        Each level's candidates are rated on their summary, and only the
+        children of relevant ones become the next level's candidates. A
+        relevant community is mapped unless one of its children is also
+        relevant, in which case the more specific reports replace it. Rating
+        calls therefore grow with the relevant part of the graph, not its size.
+
+        When top_communities is set, each level only rates that many
+        candidates, the most similar to the query first, and at most that
+        many communities are selected. Graphs without HAS_CHILD links
+        select none, so the search maps a single level instead.
+        """
+        driver = await get_async_driver(db_config)
+        database = db_config.get("database", "neo4j")
+        records, _, _ = await driver.execute_query(community_hierarchy_query, database_=database)
+        if not records[0]["hierarchy"]:
+            logger.info("No community hierarchy (HAS_CHILD) in the graph, skipping drill-down")
+            return []
+
+        embedding = embedding if self.top_communities > 0 else None
+        records, _, _ = await driver.execute_query(
+            root_communities_query, parameters_={"embedding": embedding}, database_=database)
+        candidates = [dict(record) for record in records]
+        selected, rated, levels = {}, 0, 0
+
+        while candidates and rated < DRILL_DOWN_MAX_RATED:
+            limit = DRILL_DOWN_MAX_RATED - rated
+            candidates = candidates[:min(limit, self.top_communities) if self.top_communities > 0 else limit]
+            ratings = await self.rate_communities(query, candidates)
+            rated += len(candidates)
+            levels += 1
+            relevant = []
+            for community, rating in zip(candidates, ratings):
+                if rating >= DRILL_DOWN_MIN_RATING:
+                    relevant.append({**community, "rating": rating})
+            for community in relevant:
+                selected.pop(community.get("parent"), None)
+                selected[community["community"]] = community
+            if not relevant:
+                break
+            records, _, _ = await driver.execute_query(
+                child_communities_query,
+                parameters_={"communities": [community["community"] for community in relevant],
+                             "embedding": embedding},
+                database_=database,
+            )
+            candidates = [dict(record) for record in records]
+
+        communities = list(selected.values())
+        if self.top_communities > 0:
+            communities.sort(key=lambda community: (community["rating"], community["score"] or -1), reverse=True)
+            communities = communities[:self.top_communities]
+        logger.info(f"Drill-down rated {rated} communities over {levels} levels and selected {len(communities)}")
+        return communities
+
+    async def fetch_communities(self, db_config: Dict, embedding: List[float], level: int) -> List[Dict]:
+        """
+        Returns the community reports to map over at a level.
+
+        When top_communities is set, only the communities whose report
+        embedding is most similar to the query are kept (rank breaks ties).
+        The vector index cannot filter on level, so when too few of its
+        candidates are at the level the search is repeated with more, up to
+        every community. Graphs imported without community embeddings fall
+        back to all communities at the level.
+        """
+        driver = await get_async_driver(db_config)
+        database = db_config.get("database", "neo4j")
+
+        if self.top_communities > 0:
+            try:
+                records, _, _ = await driver.execute_query(community_count_query, database_=database)
+                total = records[0]["communities"]
+                candidates = self.top_communities * COMMUNITY_CANDIDATE_FACTOR
+                while True:
+                    records, _, _ = await driver.execute_query(
+                        relevant_communities_query,
+                        parameters_={
+                            "index": db_config.get("community_index_name", "community"),
+                            "candidates": candidates,
+                            "embedding": embedding,
+                            "level": level,
+                            "topCommunities": self.top_communities,
+                        },
+                        database_=database,
+                    )
+                    if len(records) >= self.top_communities or candidates >= total:
+                        break
+                    candidates = min(candidates * COMMUNITY_CANDIDATE_FACTOR, total)
+                if records:
+                    return records
+            except ClientError as e:
+                logger.warning(f"Community pre-filtering unavailable, mapping all communities: {e}")
+
+        records, _, _ = await driver.execute_query(
+            all_communities_query,
+            parameters_={"level": level},
+            database_=database,
+        )
+        return records
+
+    async def collect_points(self, map_calls: List) -> ScoredPointHeap:
+        """
+        Runs map calls and streams their points into a ScoredPointHeap.
+
+        Collection stops as soon as the reduce budget is filled with points
+        scoring at least EARLY_EXIT_MIN_SCORE, or when the deadline passes
+        with at least one answer in hand. Map calls still running then are
+        cancelled and their responses dropped.
+        """
+        points = ScoredPointHeap(self.reduce_token_budget)
+        pending = {asyncio.ensure_future(call) for call in map_calls}
+        total = len(pending)
+        errors = []
+        deadline = asyncio.get_running_loop().time() + self.map_deadline
+
+        try:
+            while pending:
+                timeout = deadline - asyncio.get_running_loop().time()
+                if timeout <= 0 and len(points):
+                    logger.info(f"Map deadline reached with {len(pending)}/{total} calls outstanding")
+                    break
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=timeout if timeout > 0 else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                for task in done:
+                    if task.exception() is not None:
+                        errors.append(task.exception())
+                        continue
+                    for point in parse_map_points(task.result()):
+                        points.add(point)
+                if points.is_full_of(EARLY_EXIT_MIN_SCORE):
+                    logger.info(f"Reduce budget filled early with {len(pending)}/{total} calls outstanding")
+                    break
+        finally:
+            for task in pending:
+                task.cancel()
+
+        # A community that still fails after retries is dropped, not the whole query
+        if errors:
+            logger.warning(f"{len(errors)}/{total} community map calls failed and were skipped")
+            if len(errors) == total:
+                raise errors[0]
+        return points
+
+    async def asearch(self, db_config: Dict, query: str, response_type: str = "multiple paragraphs") -> str:
+        """
+        Performs a global search on the knowledge graph.
+
+        Args:
+            db_config: Dictionary containing Neo4j connection details (url, username, password)
+            query: The search query
+            response_type: Type of response to generate (default: "multiple paragraphs")
+
+        Returns:
+            The search results as a string
         """
-        MATCH (c:__Community__)
-        WHERE c.level = $level
-        RETURN c.full_content AS output
-        """,
-        params={"level": level},
-    )
-
-    # Process each community in parallel
-    async def process_community(community):
-        return await asyncio.to_thread(map_chain.invoke, {
+        identity, namespace = cache_scope(
+            db_config, await agraph_version(db_config), "global",
+            db_config.get("community_index_name", "community"), response_type,
+            "drill_down" if self.drill_down else f"level={SEARCH_LEVEL}"
+        )
+        cached = self.cache.get(identity, namespace, query)
+        if cached is not None:
+            return cached
+
+        embedding = await self.embeddings.aembed_query(query)
+        cached = self.cache.get(identity, namespace, query, embedding)
+        if cached is not None:
+            return cached
+
+        # Get community data
+        community_data = []
+        if self.drill_down:
+            community_data = await self.drill_down_communities(db_config, query, embedding)
+            if not community_data:
+                logger.info(f"Drill-down selected no communities, mapping level {SEARCH_LEVEL}")
+        if not community_data:
+            community_data = await self.fetch_communities(db_config, embedding, SEARCH_LEVEL)
+
+        # Reuse map outputs for communities whose report is unchanged since
+        # this question was last asked, and map only the rest
+        query_key = map_query_key(self.model_name, query)
+        reports = [community["output"] for community in community_data]
+        members = [(community["community"], content_hash(community["output"])) for community in community_data]
+        cached_outputs, pending = self.map_cache.lookup(identity, query_key, members)
+
+        # Pack small reports together so each map call fills its context
+        batches = [
+            [pending[i] for i in batch]
+            for batch in pack_report_batches([reports[i] for i in pending], self.map_context_tokens)
+        ]
+
+        # Process packed contexts concurrently within the provider quota
+        async def process_batch(batch):
+            context_data = join_reports([reports[i] for i in batch], self.map_context_tokens)
+            inputs = {
+                "question": query,
+                "context_data": context_data
+            }
+            output = await self.rate_limiter.call(
+                lambda: self.map_chain.ainvoke(inputs),
+                tokens=count_tokens(MAP_SYSTEM_PROMPT + query + context_data) + MAP_RESPONSE_TOKENS,
+            )
+            self.map_cache.store(identity, query_key, [members[i] for i in batch], output)
+            return output
+
+        async def cached(output):
+            return output
+
+        points = await self.collect_points(
+            [cached(output) for output in cached_outputs] + [process_batch(batch) for batch in batches]
+        )
+
+        # Generate final response
+        report_data = points.report_data()
+        reduce_inputs = {
+            "report_data": report_data,
             "question": query,
-            "context_data": community["output"]
-        })
-
-    intermediate_results = await asyncio.gather(
-        *[process_community(community) for community in community_data]
-    )
-
-    # Generate final response
-    final_response = reduce_chain.invoke({
-        "report_data": intermediate_results,
-        "question": query,
-        "response_type": response_type,
-    })
+            "response_type": response_type,
+        }
+        final_response = await self.rate_limiter.call(
+            lambda: self.reduce_chain.ainvoke(reduce_inputs),
+            tokens=count_tokens(REDUCE_SYSTEM_PROMPT + query + report_data) + REDUCE_RESPONSE_TOKENS,
+        )
+        self.cache.put(identity, namespace, query, embedding, final_response)
+
+        return final_response
+
+    def search(self, db_config: Dict, query: str, response_type: str = "multiple paragraphs") -> str:
+        """Blocking variant of asearch(), run on the shared background loop (see run_sync)"""
+        return run_sync(self.asearch(db_config, query, response_type))
+
+
+@lru_cache(maxsize=None)
+def get_global_search_engine() -> GlobalSearchEngine:
+    """Returns the per-process GlobalSearchEngine, creating it on first use"""
+    return GlobalSearchEngine()
+
+
+async def perform_global_search(db_config: Dict, query: str, response_type: str = "multiple paragraphs") -> str:
+    """
+    Performs a global search on the knowledge graph with the shared engine.
     
-    return final_response
+    Args:
+        db_config: Dictionary containing Neo4j connection details (url, username, password)
+        query: The search query
+        response_type: Type of response to generate (default: "multiple paragraphs")
+        
+    Returns:
+        The search results as a string
+    """
+    return await get_global_search_engine().asearch(db_config, query, response_type)
 
 
 # Example usage
@@ -0,0 +1,100 @@
+import os
+import json
+import shutil
+import time
+from typing import Dict, Iterable, Optional, Tuple
+import numpy as np
+import pandas as pd
+
+# Manifest of row hashes from the last import, relative to the GraphRAG project folder
+IMPORT_MANIFEST_DIR = os.getenv("IMPORT_MANIFEST_DIR", "import_manifest")
+# Bumped when table keys or hashed columns change, so older manifests are ignored
+MANIFEST_VERSION = 2
+
+
+def _hashable(series: pd.Series) -> pd.Series:
+    """Serializes list/dict cells so they can be hashed"""
+    if series.dtype != object:
+        return series
+    return series.map(
+        lambda value: json.dumps(value.tolist() if isinstance(value, np.ndarray) else value,
+                                 sort_keys=True, default=lambda v: v.tolist() if hasattr(v, "tolist") else str(v))
+        if isinstance(value, (list, dict, np.ndarray)) else value
+    )
+
+
+def row_hashes(df: pd.DataFrame, key: str, ignore: Iterable[str] = ()) -> pd.DataFrame:
+    """One (key, hash) row per input row; the hash covers every other column except ignore"""
+    values = df.drop(columns=[key, *ignore])
+    values = values.apply(_hashable) if len(values.columns) else values
+    hashes = pd.util.hash_pandas_object(values, index=False) if len(values.columns) else 0
+    return pd.DataFrame({"key": df[key].to_numpy(), "hash": np.asarray(hashes, dtype=np.uint64)})
+
+
+def manifest_path(graph_folder: str) -> str:
+    return os.path.join(graph_folder, IMPORT_MANIFEST_DIR)
+
+
+def load_manifest(graph_folder: str, database: str) -> Dict[str, pd.DataFrame]:
+    """
+    Row hashes per table from the last import into database, or {} when
+    there is none (or it was written for another database or manifest
+    version).
+    """
+    path = manifest_path(graph_folder)
+    try:
+        with open(os.path.join(path, "manifest.json")) as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if meta.get("database") != database:
+        print(f"Import manifest belongs to {meta.get('database')}, not {database}; ignoring it")
+        return {}
+    if meta.get("version") != MANIFEST_VERSION:
+        print(f"Import manifest has version {meta.get('version')}, not {MANIFEST_VERSION}; ignoring it")
+        return {}
+    # Manifests written before tables_dir existed keep their tables next to manifest.json
+    tables_dir = os.path.join(path, meta.get("tables_dir", ""))
+    return {table: pd.read_parquet(os.path.join(tables_dir, f"{table}.parquet")) for table in meta["tables"]}
+
+
+def save_manifest(graph_folder: str, database: str, hashes: Dict[str, pd.DataFrame]):
+    """
+    Stores row hashes per table.
+
+    The tables go to a new tables-<n> directory that manifest.json points
+    to, and manifest.json is replaced last in one rename, so the tables and
+    the manifest switch together: a crash keeps the previous manifest with
+    its own tables. Older table directories are removed afterwards.
+    """
+    path = manifest_path(graph_folder)
+    tables_dir = f"tables-{time.time_ns()}"
+    os.makedirs(os.path.join(path, tables_dir))
+    for table, df in hashes.items():
+        df.to_parquet(os.path.join(path, tables_dir, f"{table}.parquet"), index=False)
+    with open(os.path.join(path, "manifest.json.tmp"), "w") as f:
+        json.dump({"database": database, "version": MANIFEST_VERSION, "tables": list(hashes),
+                   "tables_dir": tables_dir}, f)
+    os.replace(os.path.join(path, "manifest.json.tmp"), os.path.join(path, "manifest.json"))
+
+    for name in os.listdir(path):
+        if name.startswith("tables-") and name != tables_dir:
+            shutil.rmtree(os.path.join(path, name), ignore_errors=True)
+        elif name.endswith(".parquet"):
+            os.remove(os.path.join(path, name))
+
+
+def diff_hashes(old: Optional[pd.DataFrame], new: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Compares two hash tables.
+
+    Returns:
+        (keys that are new or changed, keys that disappeared)
+    """
+    if old is None or old.empty:
+        return new["key"].to_numpy(), np.array([], dtype=object)
+    merged = new.merge(old, on="key", how="outer", suffixes=("", "_old"), indicator=True)
+    changed = merged[(merged["_merge"] == "left_only") |
+                     ((merged["_merge"] == "both") & (merged["hash"] != merged["hash_old"]))]
+    deleted = merged[merged["_merge"] == "right_only"]
+    return changed["key"].to_numpy(), deleted["key"].to_numpy()
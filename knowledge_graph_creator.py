@@ -1,53 +1,235 @@
 import os
+import json
 import time
-from typing import List, Dict
+import asyncio
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Iterable, Iterator, List, Dict, NamedTuple, Optional, Tuple
+import logging
+import numpy as np
 import pandas as pd
-from neo4j import GraphDatabase, Result
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from neo4j import Result
+from neo4j.exceptions import ServiceUnavailable, SessionExpired, TransientError
 from dotenv import load_dotenv
 
-# Load environment variables
+# Load environment variables before the modules below read their settings
 load_dotenv()
 
+from neo4j_drivers import close_all_async, get_async_driver, get_driver
+from rate_limiting import RateLimiter
+from context_builder import count_tokens, truncate_to_tokens
+from embedding_store import EmbeddingStore, get_embedding_store, text_hash
+from embedding_models import EMBEDDING_DIMENSIONS, EMBEDDING_MODEL, EMBEDDING_MODEL_DIMENSIONS, reduce_dimensions
+from search_cache import content_hash, db_identity, get_map_result_cache, invalidate_search_cache
+from import_manifest import diff_hashes, load_manifest, row_hashes, save_manifest
+from ann_index import refresh_entity_ann_index
+
+logger = logging.getLogger(__name__)
+
 # Database configuration
 DB_CONFIG = {
     "url": "bolt://your-neo4j-host:7687",
     "username": "neo4j",
     "password": "your-password",
     "database": "neo4j",
-    "index_name": "entity"
+    "index_name": "entity",
+    "community_index_name": "community",
+    "fulltext_index_name": "entity_fulltext"
 }
 
+# Import pipeline settings: concurrent writer sessions per stage and
+# independent stages allowed to run at the same time
+IMPORT_WRITERS = int(os.getenv("IMPORT_WRITERS", "4"))
+IMPORT_PARALLEL_STAGES = int(os.getenv("IMPORT_PARALLEL_STAGES", "3"))
+# Adaptive batching: starting payload per transaction, the commit latency
+# batches are steered towards, and bounds for the payload
+IMPORT_BATCH_BYTES = int(os.getenv("IMPORT_BATCH_BYTES", str(2 * 1024 * 1024)))
+IMPORT_TARGET_COMMIT_SECONDS = float(os.getenv("IMPORT_TARGET_COMMIT_SECONDS", "2.0"))
+IMPORT_MIN_BATCH_BYTES = 64 * 1024
+IMPORT_MAX_BATCH_BYTES = int(os.getenv("IMPORT_MAX_BATCH_BYTES", str(32 * 1024 * 1024)))
+IMPORT_MAX_RETRIES = int(os.getenv("IMPORT_MAX_RETRIES", "5"))
+# Parquet rows read per record batch by the streaming importers
+IMPORT_READ_BATCH_ROWS = int(os.getenv("IMPORT_READ_BATCH_ROWS", "50000"))
+# Per-entity neighborhood records for local search: chunk ids, community
+# reports and relationships kept per entity (relationships must cover the
+# outside-relationship top-K plus the number of seed entities)
+NEIGHBORHOOD_CHUNKS = int(os.getenv("NEIGHBORHOOD_CHUNKS", "200"))
+NEIGHBORHOOD_REPORTS = int(os.getenv("NEIGHBORHOOD_REPORTS", "10"))
+NEIGHBORHOOD_RELATIONSHIPS = int(os.getenv("NEIGHBORHOOD_RELATIONSHIPS", "40"))
+
+# Embedding pipeline settings
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "256"))
+EMBEDDING_BATCH_TOKENS = int(os.getenv("EMBEDDING_BATCH_TOKENS", "200000"))
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))
+EMBEDDING_REQUESTS_PER_MINUTE = float(os.getenv("EMBEDDING_REQUESTS_PER_MINUTE", "0"))
+EMBEDDING_TOKENS_PER_MINUTE = float(os.getenv("EMBEDDING_TOKENS_PER_MINUTE", "0"))
+# Embedding models accept up to 8191 tokens per input; longer texts are cut to fit
+EMBEDDING_MAX_INPUT_TOKENS = 8191
+# Streaming backfill: entities fetched per page and where progress is checkpointed
+EMBEDDING_PAGE_SIZE = int(os.getenv("EMBEDDING_PAGE_SIZE", "10000"))
+EMBEDDING_CHECKPOINT_PATH = os.getenv("EMBEDDING_CHECKPOINT_PATH", "embedding_checkpoint.json")
+
 def db_query(cypher: str, params: Dict = {}) -> pd.DataFrame:
     """Executes a Cypher statement and returns a DataFrame"""
-    driver = GraphDatabase.driver(DB_CONFIG["url"], auth=(DB_CONFIG["username"], DB_CONFIG["password"]))
-    return driver.execute_query(
-        cypher, parameters_=params, result_transformer_=Result.to_df
+    return get_driver(DB_CONFIG).execute_query(
+        cypher, parameters_=params, result_transformer_=Result.to_df,
+        database_=DB_CONFIG["database"]
     )
-driver = GraphDatabase.driver(DB_CONFIG["url"], auth=(DB_CONFIG["username"], DB_CONFIG["password"]))
 
-def batched_import(statement: str, df: pd.DataFrame, batch_size: int = 1000) -> int:
+def row_payload_bytes(table: pa.Table) -> np.ndarray:
+    """
+    Approximate serialized size of every row, computed column by column.
+
+    Strings count their UTF-8 bytes, lists the bytes of their elements and
+    everything else a fixed 8 bytes per value.
+    """
+    sizes = np.zeros(table.num_rows, dtype=np.int64)
+    for column in table.columns:
+        column = column.combine_chunks()
+        if pa.types.is_string(column.type) or pa.types.is_large_string(column.type):
+            sizes += pc.fill_null(pc.binary_length(column), 0).to_numpy(zero_copy_only=False)
+        elif pa.types.is_list(column.type) or pa.types.is_large_list(column.type):
+            values = pc.list_flatten(column)
+            parents = pc.list_parent_indices(column).to_numpy(zero_copy_only=False)
+            if pa.types.is_string(values.type) or pa.types.is_large_string(values.type):
+                weights = pc.fill_null(pc.binary_length(values), 0).to_numpy(zero_copy_only=False)
+            else:
+                weights = np.full(len(values), 8)
+            sizes += np.bincount(parents, weights=weights, minlength=table.num_rows).astype(np.int64)
+        else:
+            sizes += 8
+    return sizes
+
+def is_retryable_write_error(error: Exception) -> bool:
+    """Deadlocks, lock timeouts, memory limits and lost connections"""
+    if isinstance(error, (TransientError, ServiceUnavailable, SessionExpired)):
+        return True
+    code = getattr(error, "code", None) or ""
+    return "OutOfMemory" in code or "MemoryLimit" in code
+
+def log_progress(event: Dict):
+    """Default progress handler: one JSON object per log line"""
+    logger.info(json.dumps(event, default=str))
+
+class AdaptiveBatchSize:
+    """
+    Batch size in payload bytes, steered towards a target commit latency.
+
+    Fast commits grow the next batch and slow ones shrink it (at most 2x per
+    step), and a failed batch halves the target.
+    """
+
+    def __init__(self, target_bytes: int = IMPORT_BATCH_BYTES,
+                 target_seconds: float = IMPORT_TARGET_COMMIT_SECONDS,
+                 min_bytes: int = IMPORT_MIN_BATCH_BYTES, max_bytes: int = IMPORT_MAX_BATCH_BYTES):
+        self.bytes = target_bytes
+        self.target_seconds = target_seconds
+        self.min_bytes = min_bytes
+        self.max_bytes = max_bytes
+
+    def committed(self, seconds: float):
+        scale = min(2.0, max(0.5, self.target_seconds / max(seconds, 1e-3)))
+        self.bytes = int(min(self.max_bytes, max(self.min_bytes, self.bytes * scale)))
+
+    def failed(self, batch_bytes: int):
+        self.bytes = max(self.min_bytes, min(self.bytes, batch_bytes) // 2)
+
+    def next_batch(self, sizes: np.ndarray, start: int, max_rows: int) -> int:
+        """End index of the batch starting at start: at least one row, at most max_rows"""
+        cumulative = np.cumsum(sizes[start:start + max_rows])
+        return start + max(1, int(np.searchsorted(cumulative, self.bytes, side="right")))
+
+def batched_import(statement: str, df: pd.DataFrame, batch_size: int = 10000, writers: int = 1,
+                   conflict_key: Optional[Callable[[pd.DataFrame], pd.Series]] = None,
+                   on_progress: Callable[[Dict], None] = log_progress) -> int:
     """
     Import a dataframe into Neo4j using a batched approach.
 
+    Batches are sized by payload bytes rather than row count (see
+    AdaptiveBatchSize), so rows with long id lists or large reports don't
+    blow up transaction memory. A batch that fails with a retryable error
+    is split in half and retried, down to single rows.
+
+    With several writers, rows are split into lanes that are written
+    concurrently, each lane by its own session. Rows sharing a conflict key
+    (e.g. the document a chunk belongs to) always land in the same lane, so
+    concurrent batches don't lock the same nodes; any remaining lock waits
+    or deadlocks are retried by the driver's managed transactions.
+
     Args:
         statement (str): The Cypher query to execute.
         df (pd.DataFrame): The dataframe to import.
-        batch_size (int): The number of rows to import in each batch.
+        batch_size (int): The maximum number of rows in each batch.
+        writers (int): The number of concurrent writer sessions.
+        conflict_key (callable): Maps the dataframe to a per-row lane key.
+        on_progress (callable): Receives a dict per committed batch and a final summary.
 
     Returns:
         int: Total number of rows imported.
     """
     total = len(df)
     start_time = time.time()
-    for start in range(0, total, batch_size):
-        batch = df.iloc[start:min(start + batch_size, total)]
-        result = driver.execute_query(
+
+    # One vectorized conversion: Arrow turns NaN into None and arrays into lists
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    records = table.to_pylist()
+    sizes = row_payload_bytes(table)
+
+    if writers <= 1 or total <= batch_size:
+        lanes = [np.arange(total)]
+    else:
+        if conflict_key is not None:
+            lane_ids = conflict_key(df).map(lambda key: hash(str(key)) % writers).to_numpy()
+        else:
+            # No shared nodes: deal row blocks out round-robin
+            lane_ids = (np.arange(total) // batch_size) % writers
+        lanes = [np.flatnonzero(lane_ids == lane) for lane in range(writers)]
+
+    def write_batch(rows: List[Dict]):
+        return get_driver(DB_CONFIG).execute_query(
             "UNWIND $rows AS value " + statement,
-            rows=batch.to_dict('records'),
+            rows=rows,
             database_=DB_CONFIG["database"]
         )
-        print(result.summary.counters)
-    print(f'{total} rows imported in {time.time() - start_time:.2f} seconds.')
+
+    def write_lane(lane: int, indices: np.ndarray):
+        lane_sizes = sizes[indices]
+        batcher = AdaptiveBatchSize()
+        position, retries = 0, 0
+        while position < len(indices):
+            end = batcher.next_batch(lane_sizes, position, batch_size)
+            rows = [records[i] for i in indices[position:end]]
+            batch_start = time.time()
+            try:
+                result = write_batch(rows)
+            except Exception as e:
+                if not is_retryable_write_error(e) or retries >= IMPORT_MAX_RETRIES:
+                    raise
+                retries += 1
+                batcher.failed(int(lane_sizes[position:end].sum()))
+                on_progress({"event": "retry", "lane": lane, "rows": len(rows), "retry": retries,
+                             "next_batch_bytes": batcher.bytes, "error": str(e)})
+                time.sleep(min(30.0, 0.5 * 2 ** retries))
+                continue
+
+            seconds = time.time() - batch_start
+            batcher.committed(seconds)
+            position, retries = end, 0
+            counters = {key: value for key, value in vars(result.summary.counters).items()
+                        if value and not key.startswith("_")}
+            on_progress({"event": "batch", "lane": lane, "rows": len(rows),
+                         "bytes": int(lane_sizes[position - len(rows):position].sum()),
+                         "seconds": round(seconds, 3), "lane_done": position, "lane_total": len(indices),
+                         "next_batch_bytes": batcher.bytes, "counters": counters})
+
+    with ThreadPoolExecutor(max_workers=len(lanes)) as pool:
+        # list() re-raises the first writer error
+        list(pool.map(write_lane, range(len(lanes)), lanes))
+    seconds = time.time() - start_time
+    on_progress({"event": "done", "rows": total, "bytes": int(sizes.sum()), "seconds": round(seconds, 2),
+                 "rows_per_second": round(total / seconds, 1) if seconds > 0 else None})
     return total
 
 def create_constraints():
@@ -64,246 +246,1107 @@ def create_constraints():
 
     for statement in statements:
         print(f"Executing: {statement}")
-        driver.execute_query(statement)
+        get_driver(DB_CONFIG).execute_query(statement, database_=DB_CONFIG["database"])
 
-def import_documents(graph_folder: str):
-    """Import documents into the database."""
-    doc_df = pd.read_parquet(f'{graph_folder}/output/documents.parquet', columns=["id", "title"])
-    statement = """
-    MERGE (d:__Document__ {id: value.id})
-    SET d += value {.title}
+DOCUMENT_STATEMENT = """
+MERGE (d:__Document__ {id: value.id})
+SET d += value {.title}
+"""
+
+def iter_parquet(graph_folder: str, name: str, columns: List[str],
+                 batch_rows: int = IMPORT_READ_BATCH_ROWS) -> Iterator[pd.DataFrame]:
+    """Streams output/<name>.parquet in record batches, reading only the given columns"""
+    parquet_file = pq.ParquetFile(f'{graph_folder}/output/{name}.parquet')
+    for batch in parquet_file.iter_batches(batch_size=batch_rows, columns=columns):
+        yield batch.to_pandas()
+
+def record_hashes(hashes: Optional[Dict[str, List[pd.DataFrame]]], name: str, df: pd.DataFrame):
+    """Adds the manifest row hashes of imported rows of a table, if hashes are being collected"""
+    if hashes is not None:
+        hashes.setdefault(name, []).append(row_hashes(df, IMPORT_TABLE_KEYS[name], IMPORT_VOLATILE_COLUMNS.get(name, ())))
+
+def import_parquet(statement: str, graph_folder: str, name: str, columns: List[str],
+                   transform: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None,
+                   hashes: Optional[Dict[str, List[pd.DataFrame]]] = None, **kwargs) -> int:
     """
-    batched_import(statement, doc_df)
+    Streams a parquet file into batched_import one record batch at a time,
+    so peak memory is bounded by IMPORT_READ_BATCH_ROWS rather than the file.
 
-def import_text_units(graph_folder: str):
+    Args:
+        statement: Cypher run as "UNWIND $rows AS value " + statement
+        graph_folder: GraphRAG project folder containing output/*.parquet
+        name: Table name, e.g. "entities"
+        columns: Columns to read
+        transform: Optional per-batch dataframe transformation
+        hashes: Collects the manifest row hashes of each batch under name
+        **kwargs: Passed on to batched_import
+
+    Returns:
+        Total number of rows imported
+    """
+    total = 0
+    for df in iter_parquet(graph_folder, name, columns):
+        if transform is not None:
+            df = transform(df)
+        total += batched_import(statement, df, **kwargs)
+        record_hashes(hashes, name, df)
+    return total
+
+def import_documents(graph_folder: str, hashes: Optional[Dict[str, List[pd.DataFrame]]] = None):
+    """Import documents into the database."""
+    return import_parquet(DOCUMENT_STATEMENT, graph_folder, "documents", ["id", "title"],
+                          hashes=hashes, writers=IMPORT_WRITERS)
+
+TEXT_UNIT_STATEMENT = """
+MERGE (c:__Chunk__ {id: value.id})
+SET c += value {.text, .n_tokens}
+WITH c, value
+UNWIND value.document_ids AS document
+MATCH (d:__Document__ {id: document})
+MERGE (c)-[:PART_OF]->(d)
+"""
+
+def import_text_units(graph_folder: str, hashes: Optional[Dict[str, List[pd.DataFrame]]] = None):
     """Import text units into the database."""
-    text_df = pd.read_parquet(f'{graph_folder}/output/text_units.parquet',
-                              columns=["id", "text", "n_tokens", "document_ids"])
-    statement = """
-    MERGE (c:__Chunk__ {id: value.id})
-    SET c += value {.text, .n_tokens}
-    WITH c, value
-    UNWIND value.document_ids AS document
-    MATCH (d:__Document__ {id: document})
-    MERGE (c)-[:PART_OF]->(d)
-    """
-    batched_import(statement, text_df)
-
-def import_entities(graph_folder: str):
+    return import_parquet(TEXT_UNIT_STATEMENT, graph_folder, "text_units",
+                          ["id", "text", "n_tokens", "document_ids"], hashes=hashes, writers=IMPORT_WRITERS,
+                          conflict_key=lambda df: df["document_ids"].str[0])
+
+# Entities are matched on their name, which stays the same across GraphRAG
+# runs; the id is only set when the node is created, so ids other nodes and
+# records refer to don't change when a re-index assigns new ones.
+ENTITY_STATEMENT = """
+MERGE (e:__Entity__ {name: value.name})
+ON CREATE SET e.id = value.id
+SET e += value {.human_readable_id, .description}
+WITH e, value
+CALL apoc.create.addLabels(e, CASE WHEN coalesce(value.type, "") = "" THEN [] ELSE [apoc.text.upperCamelCase(replace(value.type, '"', ''))] END) YIELD node
+UNWIND value.text_unit_ids AS text_unit
+MATCH (c:__Chunk__ {id: text_unit})
+MERGE (c)-[:HAS_ENTITY]->(e)
+"""
+
+def entity_rows(entity_df: pd.DataFrame) -> pd.DataFrame:
+    """Adds the cleaned name (as stored in e.name) that entities are keyed by"""
+    return entity_df.assign(name=entity_df["title"].str.replace('"', '', regex=False))
+
+def import_entities(graph_folder: str, hashes: Optional[Dict[str, List[pd.DataFrame]]] = None):
     """Import entities into the database."""
-    entity_df = pd.read_parquet(f'{graph_folder}/output/entities.parquet',
-                                columns=["id", "human_readable_id", "title", "type", "description", "text_unit_ids"])
-    entity_statement = """
-    MERGE (e:__Entity__ {id: value.id})
-    SET e += value {.human_readable_id, .description, name: replace(value.title, '"', '')}
-    WITH e, value
-    CALL apoc.create.addLabels(e, CASE WHEN coalesce(value.type, "") = "" THEN [] ELSE [apoc.text.upperCamelCase(replace(value.type, '"', ''))] END) YIELD node
-    UNWIND value.text_unit_ids AS text_unit
-    MATCH (c:__Chunk__ {id: text_unit})
-    MERGE (c)-[:HAS_ENTITY]->(e)
-    """
-    batched_import(entity_statement, entity_df)
-
-def import_relationships(graph_folder: str):
+    return import_parquet(ENTITY_STATEMENT, graph_folder, "entities",
+                          ["id", "human_readable_id", "title", "type", "description", "text_unit_ids"],
+                          transform=entity_rows, hashes=hashes, writers=IMPORT_WRITERS,
+                          conflict_key=lambda df: df["text_unit_ids"].str[0])
+
+def entity_ids_by_name(graph_folder: str) -> pd.Series:
+    """Maps cleaned entity names (as stored in e.name) to entity ids"""
+    entity_df = pd.concat(iter_parquet(graph_folder, "entities", ["id", "title"]), ignore_index=True)
+    names = entity_df["title"].str.replace('"', '', regex=False)
+    # First row wins for repeated names, as with MERGE ... ON CREATE SET e.id
+    return pd.Series(entity_df["id"].values, index=names.values).groupby(level=0).first()
+
+def resolve_relationships(rel_df: pd.DataFrame, ids: pd.Series) -> pd.DataFrame:
+    """
+    Cleans source/target to entity names, adds their source_id/target_id and
+    the (source, target) pair relationships are keyed by, and drops rows
+    whose endpoints don't exist.
+    """
+    source = rel_df["source"].str.replace('"', '', regex=False)
+    target = rel_df["target"].str.replace('"', '', regex=False)
+    rel_df = rel_df.assign(
+        source=source,
+        target=target,
+        source_id=source.map(ids),
+        target_id=target.map(ids),
+        pair=[json.dumps([s, t]) for s, t in zip(source, target)],
+    )
+    return rel_df.dropna(subset=["source_id", "target_id"])
+
+# Relationships are matched on their endpoint names, and keep the id they
+# were created with for the same reason as entities
+RELATIONSHIP_STATEMENT = """
+MATCH (source:__Entity__ {name: value.source})
+MATCH (target:__Entity__ {name: value.target})
+MERGE (source)-[rel:RELATED]->(target)
+ON CREATE SET rel.id = value.id
+SET rel += value {.weight, .human_readable_id, .description, .text_unit_ids}
+RETURN count(*) AS createdRels
+"""
+
+def import_relationships(graph_folder: str, hashes: Optional[Dict[str, List[pd.DataFrame]]] = None):
     """Import relationships into the database."""
-    rel_df = pd.read_parquet(f'{graph_folder}/output/relationships.parquet',
-                             columns=["id", "human_readable_id", "source", "target", "description", "weight", "text_unit_ids"])
-    rel_statement = """
-    MATCH (source:__Entity__ {name: replace(value.source, '"', '')})
-    MATCH (target:__Entity__ {name: replace(value.target, '"', '')})
-    MERGE (source)-[rel:RELATED {id: value.id}]->(target)
-    SET rel += value {.weight, .human_readable_id, .description, .text_unit_ids}
-    RETURN count(*) AS createdRels
+    ids = entity_ids_by_name(graph_folder)
+    return import_parquet(RELATIONSHIP_STATEMENT, graph_folder, "relationships",
+                          ["id", "human_readable_id", "source", "target", "description", "weight", "text_unit_ids"],
+                          transform=lambda df: resolve_relationships(df, ids),
+                          hashes=hashes, writers=IMPORT_WRITERS, conflict_key=lambda df: df["source_id"])
+
+def relationship_endpoints(graph_folder: str) -> pd.DataFrame:
+    """Relationship ids with their endpoint names"""
+    ids = entity_ids_by_name(graph_folder)
+    return pd.concat(
+        (resolve_relationships(df, ids)[["id", "source", "target"]]
+         for df in iter_parquet(graph_folder, "relationships", ["id", "source", "target"])),
+        ignore_index=True,
+    )
+
+def community_memberships(community_df: pd.DataFrame, rel_df: pd.DataFrame) -> pd.DataFrame:
     """
-    batched_import(rel_statement, rel_df)
+    (entity, community) pairs: the names of both endpoints of every
+    relationship a community contains, computed from the parquet files.
 
-def import_communities(graph_folder: str):
-    """Import communities into the database."""
-    community_df = pd.read_parquet(f'{graph_folder}/output/communities.parquet',
-                                   columns=["id", "level", "title", "text_unit_ids", "relationship_ids"])
-    statement = """
-    MERGE (c:__Community__ {community: value.id})
-    SET c += value {.level, .title}
-    WITH *
-    UNWIND value.relationship_ids AS rel_id
-    MATCH (start:__Entity__)-[:RELATED {id: rel_id}]->(end:__Entity__)
-    MERGE (start)-[:IN_COMMUNITY]->(c)
-    MERGE (end)-[:IN_COMMUNITY]->(c)
-    RETURN count(DISTINCT c) AS createdCommunities
-    """
-    batched_import(statement, community_df)
-
-def import_community_reports(graph_folder: str):
-    """Import community reports into the database."""
-    community_report_df = pd.read_parquet(f'{graph_folder}/output/community_reports.parquet',
-                                          columns=["id", "community", "level", "title", "summary", "findings", 
-                                                  "rank", "rating_explanation", "full_content"])
-    community_statement = """
-    MERGE (c:__Community__ {community: value.community})
-    SET c += value {.level, .title, .rank, rating_explanation: value.rating_explanation, .full_content, .summary}
-    WITH c, value
-    UNWIND range(0, size(value.findings)-1) AS finding_idx
-    WITH c, value, finding_idx, value.findings[finding_idx] AS finding
-    MERGE (c)-[:HAS_FINDING]->(f:Finding {id: finding_idx})
-    SET f += finding
-    """
-    batched_import(community_statement, community_report_df)
-
-def create_vector_index():
-    db_query(
-        """
-    CREATE VECTOR INDEX """
-        + DB_CONFIG["index_name"]
-        + """ IF NOT EXISTS FOR (e:__Entity__) ON e.description_embedding
-    OPTIONS {indexConfig: {
-    `vector.dimensions`: 3072,
-    `vector.similarity_function`: 'cosine'
-    }}
+    Args:
+        community_df: Communities with id and relationship_ids
+        rel_df: relationship_endpoints()
     """
-)
+    pairs = (
+        community_df[["id", "relationship_ids"]]
+        .explode("relationship_ids")
+        .merge(rel_df[["id", "source", "target"]], left_on="relationship_ids", right_on="id",
+               suffixes=("", "_rel"))
+        .melt(id_vars=["id"], value_vars=["source", "target"], value_name="entity")
+    )
+    return (pairs.rename(columns={"id": "community"})[["entity", "community"]]
+            .drop_duplicates()
+            .reset_index(drop=True))
+
+def community_rows(community_df: pd.DataFrame, memberships: pd.DataFrame) -> pd.DataFrame:
+    """Community rows as imported, with their sorted member entity names (see community_memberships)"""
+    members = memberships.sort_values("entity").groupby("community")["entity"].agg(list)
+    return community_df[["id", "level", "title"]].assign(
+        entities=community_df["id"].map(members).map(lambda names: names if isinstance(names, list) else []))
 
-def get_entities_from_database():
+COMMUNITY_STATEMENT = """
+MERGE (c:__Community__ {community: value.id})
+SET c += value {.level, .title}
+"""
+
+MEMBERSHIP_STATEMENT = """
+MATCH (e:__Entity__ {name: value.entity})
+MATCH (c:__Community__ {community: value.community})
+MERGE (e)-[:IN_COMMUNITY]->(c)
+"""
+
+def import_communities(graph_folder: str, hashes: Optional[Dict[str, List[pd.DataFrame]]] = None):
+    """Import communities into the database."""
+    rel_df = relationship_endpoints(graph_folder)
+    total = 0
+    for community_df in iter_parquet(graph_folder, "communities", ["id", "level", "title", "relationship_ids"]):
+        memberships = community_memberships(community_df, rel_df)
+        total += batched_import(COMMUNITY_STATEMENT, community_df[["id", "level", "title"]], writers=IMPORT_WRITERS)
+        batched_import(MEMBERSHIP_STATEMENT, memberships,
+                       writers=IMPORT_WRITERS, conflict_key=lambda df: df["community"])
+        record_hashes(hashes, "communities", community_rows(community_df, memberships))
+    return total
+
+def derive_community_parents(community_df: pd.DataFrame, memberships: pd.DataFrame) -> pd.DataFrame:
     """
-    Fetch entities from Neo4j database that need embeddings
-    Returns a list of (id, description) tuples
+    (parent, child) community pairs for graphs whose parquet files carry no
+    parent column. Leiden communities nest, so a community's parent is the
+    community one level up that shares the most of its entities.
+
+    Args:
+        community_df: Communities with id and level
+        memberships: community_memberships() of the same communities
     """
-    with driver.session(database=DB_CONFIG["database"]) as session:
-        result = session.run(
-            """
-            MATCH (e:__Entity__)
-            WHERE e.description IS NOT NULL AND e.description_embedding IS NULL
-            RETURN e.id AS id, e.description AS description
-            LIMIT 1000
-            """
-        )
-        return [(record["id"], record["description"]) for record in result]
+    members = memberships.assign(level=memberships["community"].map(community_df.set_index("id")["level"]))
+    pairs = members.merge(members, on="entity", suffixes=("", "_parent"))
+    pairs = pairs[pairs["level_parent"] == pairs["level"] - 1]
+    best = (pairs.groupby(["community", "community_parent"]).size().reset_index(name="shared")
+            .sort_values(["community", "shared"], ascending=[True, False], kind="stable")
+            .drop_duplicates("community"))
+    return pd.DataFrame({"parent": best["community_parent"].to_numpy(), "child": best["community"].to_numpy()})
 
-def get_entities_from_parquet(graph_folder):
+def community_hierarchy(graph_folder: str) -> pd.DataFrame:
     """
-    Alternative: Read entities from parquet file
+    (parent, child) community pairs. GraphRAG versions that write community
+    and parent columns link the report nodes (keyed by community number);
+    older outputs are linked by derive_community_parents().
     """
-    entity_df = pd.read_parquet(
-        f'{graph_folder}/output/entities.parquet',
-        columns=["id", "description"]
-    )
-    return [(row.id, row.description) for _, row in entity_df.iterrows() if row.description]
+    path = f'{graph_folder}/output/communities.parquet'
+    if {"community", "parent"} <= set(pq.ParquetFile(path).schema_arrow.names):
+        df = pd.read_parquet(path, columns=["community", "parent"])
+        df = df[df["parent"].notna() & (df["parent"] != -1)]
+        return pd.DataFrame({"parent": df["parent"].to_numpy(), "child": df["community"].to_numpy()})
+    community_df = pd.read_parquet(path, columns=["id", "level", "relationship_ids"])
+    return derive_community_parents(community_df,
+                                    community_memberships(community_df, relationship_endpoints(graph_folder)))
+
+COMMUNITY_HIERARCHY_STATEMENT = """
+MATCH (p:__Community__ {community: value.parent})
+MATCH (c:__Community__ {community: value.child})
+MERGE (p)-[:HAS_CHILD]->(c)
+"""
 
-def update_entity_embeddings(entity_id, embedding):
+def import_community_hierarchy(graph_folder: str, hashes: Optional[Dict[str, List[pd.DataFrame]]] = None):
+    """Links each community to its parent one level up, for drill-down global search"""
+    hierarchy_df = community_hierarchy(graph_folder)
+    record_hashes(hashes, "community_hierarchy", hierarchy_df)
+    if hierarchy_df.empty:
+        return 0
+    return batched_import(COMMUNITY_HIERARCHY_STATEMENT, hierarchy_df, writers=IMPORT_WRITERS,
+                          conflict_key=lambda df: df["parent"])
+
+COMMUNITY_REPORT_STATEMENT = """
+MERGE (c:__Community__ {community: value.community})
+SET c += value {.level, .title, .rank, rating_explanation: value.rating_explanation, .full_content, .summary}
+WITH c, value
+UNWIND range(0, size(value.findings)-1) AS finding_idx
+WITH c, value, finding_idx, value.findings[finding_idx] AS finding
+MERGE (c)-[:HAS_FINDING]->(f:Finding {id: finding_idx})
+SET f += finding
+"""
+
+def import_community_reports(graph_folder: str, hashes: Optional[Dict[str, List[pd.DataFrame]]] = None):
+    """Import community reports into the database."""
+    total, report_hashes = 0, {}
+    for community_report_df in iter_parquet(graph_folder, "community_reports",
+                                            ["id", "community", "level", "title", "summary", "findings",
+                                             "rank", "rating_explanation", "full_content"]):
+        total += batched_import(COMMUNITY_REPORT_STATEMENT, community_report_df, writers=IMPORT_WRITERS)
+        record_hashes(hashes, "community_reports", community_report_df)
+        report_hashes.update({
+            str(community): content_hash(full_content)
+            for community, full_content in zip(community_report_df["community"], community_report_df["full_content"])
+        })
+
+    # Drop cached global search map outputs only for reports that changed
+    get_map_result_cache().invalidate_changed(db_identity(DB_CONFIG), report_hashes)
+    return total
+
+# Vector indexes as (config key of the index name, label, embedding property)
+VECTOR_INDEXES = [
+    ("index_name", "__Entity__", "description_embedding"),
+    ("community_index_name", "__Community__", "summary_embedding"),
+]
+
+def create_vector_index() -> bool:
     """
-    Update a single entity with its embedding in Neo4j
+    Creates the entity and community vector indexes for EMBEDDING_DIMENSIONS.
+    An index built for another size is dropped together with the vectors of
+    that size, so the embedding stages write them again (from the embedding
+    store) at the configured size.
+
+    Returns:
+        Whether an index was recreated with a new size
     """
-    with driver.session(database=DB_CONFIG["database"]) as session:
-        result = session.run(
+    resized = False
+    for config_key, label, prop in VECTOR_INDEXES:
+        existing = db_query(
             """
-            MATCH (e:__Entity__ {id: $id})
-            SET e.description_embedding = $embedding
-            RETURN e.id
+            SHOW INDEXES YIELD name, type, options
+            WHERE name = $name AND type = 'VECTOR'
+            RETURN options.indexConfig['vector.dimensions'] AS dimensions
             """,
-            id=entity_id,
-            embedding=embedding
+            {"name": DB_CONFIG[config_key]},
         )
-        return result.single()
+        if not existing.empty and existing["dimensions"][0] != EMBEDDING_DIMENSIONS:
+            print(f"Vector index {DB_CONFIG[config_key]} has {existing['dimensions'][0]} dimensions, "
+                  f"recreating it with {EMBEDDING_DIMENSIONS}")
+            db_query("DROP INDEX " + DB_CONFIG[config_key])
+            resized = True
+            while True:
+                cleared = db_query(
+                    f"""
+                    MATCH (n:{label}) WHERE n.{prop} IS NOT NULL AND size(n.{prop}) <> $dimensions
+                    WITH n LIMIT 10000
+                    SET n.{prop} = null
+                    RETURN count(*) AS count
+                    """,
+                    {"dimensions": EMBEDDING_DIMENSIONS},
+                )
+                if cleared["count"][0] == 0:
+                    break
+        db_query(
+            "CREATE VECTOR INDEX " + DB_CONFIG[config_key]
+            + f""" IF NOT EXISTS FOR (n:{label}) ON n.{prop}
+    OPTIONS {{indexConfig: {{
+    `vector.dimensions`: {EMBEDDING_DIMENSIONS},
+    `vector.similarity_function`: 'cosine'
+    }}}}
+    """
+        )
+    return resized
+
+def create_fulltext_index():
+    """Full-text index on entity names and descriptions for local search's keyword seeds"""
+    db_query(
+        "CREATE FULLTEXT INDEX " + DB_CONFIG["fulltext_index_name"]
+        + " IF NOT EXISTS FOR (e:__Entity__) ON EACH [e.name, e.description]"
+    )
 
-def batch_update_embeddings(entity_embeddings, batch_size=100):
+def get_entities_from_parquet(graph_folder):
     """
-    Batch update entities with embeddings
+    Alternative: Stream (id, description) pairs from the parquet file
     """
-    total = len(entity_embeddings)
-    start_time = time.time()
-    
-    for i in range(0, total, batch_size):
-        batch = entity_embeddings[i:min(i + batch_size, total)]
-        
-        with driver.session(database=DB_CONFIG["database"]) as session:
-            result = session.run(
-                """
-                UNWIND $batch AS item
-                MATCH (e:__Entity__ {id: item.id})
-                SET e.description_embedding = item.embedding
-                RETURN count(*) as updated
-                """,
-                batch=[{"id": eid, "embedding": emb} for eid, emb in batch]
-            )
-            updated = result.single()["updated"]
-            print(f"Batch {i//batch_size + 1}: Updated {updated} entities")
-    
-    print(f'Processed {total} entities in {time.time() - start_time:.2f} seconds')
+    for batch in pq.ParquetFile(f'{graph_folder}/output/entities.parquet').iter_batches(
+            batch_size=IMPORT_READ_BATCH_ROWS, columns=["id", "description"]):
+        for entity_id, description in zip(batch.column("id").to_pylist(), batch.column("description").to_pylist()):
+            if description:
+                yield entity_id, description
 
-def process_entity_embeddings(source="database", graph_folder=None):
+def embedding_model_key() -> str:
     """
-    Main function to process entity embeddings
+    Identifies the vectors a model configuration produces in the embedding
+    store. The store keeps full-size vectors, so changing
+    EMBEDDING_DIMENSIONS re-uses them instead of calling the provider.
+    """
+    return f"{EMBEDDING_MODEL}:{EMBEDDING_MODEL_DIMENSIONS}"
+
+def get_embeddings_client():
+    """
+    Returns the embeddings client selected by EMBEDDING_PROVIDER
     """
-    print("Fetching entities...")
-    
     # Check which embedding provider to use
     embedding_provider = os.getenv("EMBEDDING_PROVIDER", "azure").lower()
     
     if embedding_provider == "azure":
         # Initialize Azure OpenAI Embeddings
         from langchain_openai import AzureOpenAIEmbeddings
-        embeddings = AzureOpenAIEmbeddings(
-            model="text-embedding-3-large",
+        return AzureOpenAIEmbeddings(
+            model=EMBEDDING_MODEL,
             api_key=os.getenv("AZURE_OPENAI_API_KEY_EMBEDDINGS"),
+            # Retries are handled by the embedding pipeline's rate limiter
+            max_retries=0,
             # azure_endpoint will be read from AZURE_OPENAI_ENDPOINT env variable
         )
     else:
         # Initialize Standard OpenAI Embeddings
         from langchain_openai import OpenAIEmbeddings
-        embeddings = OpenAIEmbeddings(
-            model="text-embedding-3-large",
-            dimensions=3072,
-            api_key=os.getenv("OPENAI_API_KEY")
+        return OpenAIEmbeddings(
+            model=EMBEDDING_MODEL,
+            dimensions=EMBEDDING_MODEL_DIMENSIONS,
+            api_key=os.getenv("OPENAI_API_KEY"),
+            max_retries=0
         )
+
+def run_async(coro):
+    """Runs an importer coroutine, closing the async drivers it opened on its loop"""
+    async def runner():
+        try:
+            return await coro
+        finally:
+            await close_all_async()
+    return asyncio.run(runner())
+
+def batch_by_tokens(items: Iterable[Tuple[str, str]], batch_size: int = EMBEDDING_BATCH_SIZE,
+                    batch_tokens: int = EMBEDDING_BATCH_TOKENS) -> Iterator[List[Tuple[str, str, int]]]:
+    """
+    Groups (id, text) pairs into embedding requests bounded by item count
+    and total tokens. Texts are truncated to the model's input limit.
     
-    # Get entities either from database or parquet file
-    if source == "database":
-        entities = get_entities_from_database()
-    else:
-        entities = get_entities_from_parquet(graph_folder)
+    Yields:
+        Lists of (id, text, tokens)
+    """
+    batch, tokens = [], 0
+    for item_id, text in items:
+        if not text:
+            continue
+        text = truncate_to_tokens(text, EMBEDDING_MAX_INPUT_TOKENS)
+        text_tokens = count_tokens(text)
+        if batch and (len(batch) >= batch_size or tokens + text_tokens > batch_tokens):
+            yield batch
+            batch, tokens = [], 0
+        batch.append((item_id, text, text_tokens))
+        tokens += text_tokens
+    if batch:
+        yield batch
+
+async def embed_and_write(items: Iterable[Tuple[str, str]], write_statement: str, embeddings=None,
+                          batch_size: int = EMBEDDING_BATCH_SIZE,
+                          concurrency: int = EMBEDDING_CONCURRENCY,
+                          store: EmbeddingStore = None) -> Dict:
+    """
+    Embeds (id, text) pairs with concurrent embed_documents calls and writes
+    each finished batch to Neo4j while later batches are still embedding.
+    Texts already in the embedding store are written without calling the
+    provider, and new vectors are added to the store. Vectors are reduced
+    to EMBEDDING_DIMENSIONS when they are written.
     
-    if not entities:
-        print("No entities found that need embeddings.")
-        return
+    Args:
+        items: (id, text) pairs to embed
+        write_statement: Cypher run as "UNWIND $rows AS item " + write_statement,
+            with item.id and item.embedding
+        embeddings: Embeddings client (default: get_embeddings_client())
+        batch_size: Maximum texts per embedding request
+        concurrency: Embedding requests in flight at once
+        store: Embedding store (default: get_embedding_store())
     
-    print(f"Found {len(entities)} entities to process")
+    Returns:
+        Counters for embedded, cached, written and failed items
+    """
+    embeddings = embeddings or get_embeddings_client()
+    store = store or get_embedding_store()
+    model_key = embedding_model_key()
+    limiter = RateLimiter(
+        max_concurrency=concurrency,
+        requests_per_minute=EMBEDDING_REQUESTS_PER_MINUTE,
+        tokens_per_minute=EMBEDDING_TOKENS_PER_MINUTE,
+    )
+    driver = await get_async_driver(DB_CONFIG)
+    # Bounded so embedding cannot run arbitrarily far ahead of the writer
+    queue = asyncio.Queue(maxsize=concurrency * 2)
+    stats = {"embedded": 0, "cached": 0, "written": 0, "failed": 0}
+    batches = batch_by_tokens(items, batch_size)
+    start_time = time.time()
     
-    # Process embeddings
-    entity_embeddings = []
+    async def writer():
+        while True:
+            rows = await queue.get()
+            if rows is None:
+                return
+            try:
+                await driver.execute_query(
+                    "UNWIND $rows AS item " + write_statement,
+                    rows=rows,
+                    database_=DB_CONFIG["database"]
+                )
+                stats["written"] += len(rows)
+                print(f"Wrote {stats['written']} embeddings ({time.time() - start_time:.1f}s)")
+            except Exception as e:
+                stats["failed"] += len(rows)
+                print(f"Error writing {len(rows)} embeddings: {str(e)}")
     
-    for i, (entity_id, description) in enumerate(entities):
-        if not description:
-            continue
-        
-        try:
-            # Generate embedding for the description
-            embedding = embeddings.embed_query(description)
-            entity_embeddings.append((entity_id, embedding))
+    async def embedder():
+        # Workers share one batch iterator, so each batch is embedded once
+        for batch in batches:
+            hashes = [text_hash(text) for _, text, _ in batch]
+            vectors = store.get_many(model_key, hashes) if store else {}
+            stats["cached"] += sum(1 for digest in hashes if digest in vectors)
+            
+            # Only texts the store has never seen go to the provider
+            missing = {}
+            for (_, text, tokens), digest in zip(batch, hashes):
+                if digest not in vectors:
+                    missing.setdefault(digest, (text, tokens))
+            if missing:
+                texts = [text for text, _ in missing.values()]
+                try:
+                    embedded = await limiter.call(
+                        lambda: embeddings.aembed_documents(texts),
+                        tokens=sum(tokens for _, tokens in missing.values()),
+                    )
+                except Exception as e:
+                    stats["failed"] += sum(1 for digest in hashes if digest in missing)
+                    print(f"Error embedding batch of {len(missing)}: {str(e)}")
+                    embedded = None
+                if embedded is not None:
+                    new_vectors = dict(zip(missing.keys(), embedded))
+                    if store:
+                        store.put_many(model_key, new_vectors)
+                    vectors.update(new_vectors)
+                    stats["embedded"] += sum(1 for digest in hashes if digest in new_vectors)
             
-            # Optional: Print progress
-            if (i + 1) % 10 == 0:
-                print(f"Processed {i + 1}/{len(entities)} entities")
-                
-        except Exception as e:
-            print(f"Error embedding entity {entity_id}: {str(e)}")
+            rows = [
+                {"id": item_id, "embedding": reduce_dimensions(vectors[digest])}
+                for (item_id, _, _), digest in zip(batch, hashes)
+                if digest in vectors
+            ]
+            if rows:
+                await queue.put(rows)
+    
+    writer_task = asyncio.create_task(writer())
+    try:
+        await asyncio.gather(*[embedder() for _ in range(concurrency)])
+    finally:
+        await queue.put(None)
+        await writer_task
+    
+    print(f'Embedded {stats["embedded"]} items and reused {stats["cached"]} stored embeddings '
+          f'in {time.time() - start_time:.2f} seconds ({stats["failed"]} failed)')
+    return stats
+
+def load_checkpoint(path: str = EMBEDDING_CHECKPOINT_PATH, database: Optional[str] = None) -> Dict:
+    """
+    Returns the saved backfill progress for database, or an empty checkpoint
+    when there is none (or it was written for another database).
+    """
+    empty = {"database": database, "last_id": None, "embedded": 0, "failed": 0}
+    if not os.path.exists(path):
+        return empty
+    with open(path) as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("database") != database:
+        print(f"Embedding checkpoint belongs to {checkpoint.get('database')}, not {database}; ignoring it")
+        return empty
+    return checkpoint
+
+def save_checkpoint(checkpoint: Dict, path: str = EMBEDDING_CHECKPOINT_PATH):
+    """Writes progress atomically so a crash never leaves a partial file"""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+async def backfill_entity_embeddings(page_size: int = EMBEDDING_PAGE_SIZE, resume: bool = True,
+                                     checkpoint_path: str = EMBEDDING_CHECKPOINT_PATH) -> Dict:
+    """
+    Streams entities without embeddings in pages ordered by id, embedding and
+    writing each page before fetching the next, so memory stays bounded by
+    the page size whatever the graph size.
+    
+    The id of the last finished page is checkpointed with the database
+    identity, and a later run with resume=True against the same database
+    continues after it. The checkpoint is removed once the
+    backfill completes so the next run picks up entities that failed.
+    
+    Args:
+        page_size: Entities fetched per keyset page
+        resume: Continue from the saved checkpoint if there is one
+        checkpoint_path: Where progress is stored
+    
+    Returns:
+        The final checkpoint counters
+    """
+    database = db_identity(DB_CONFIG)
+    checkpoint = (load_checkpoint(checkpoint_path, database) if resume
+                  else {"database": database, "last_id": None, "embedded": 0, "failed": 0})
+    if checkpoint["last_id"] is not None:
+        print(f"Resuming embedding backfill after entity {checkpoint['last_id']}")
+    
+    driver = await get_async_driver(DB_CONFIG)
+    embeddings = get_embeddings_client()
+    
+    while True:
+        # Keyset pagination over the entity id constraint index
+        records, _, _ = await driver.execute_query(
+            """
+            MATCH (e:__Entity__)
+            WHERE e.id > $after AND e.description IS NOT NULL AND e.description_embedding IS NULL
+            RETURN e.id AS id, e.description AS description
+            ORDER BY e.id
+            LIMIT $pageSize
+            """,
+            after=checkpoint["last_id"] or "",
+            pageSize=page_size,
+            database_=DB_CONFIG["database"]
+        )
+        if not records:
+            break
+        
+        stats = await embed_and_write(
+            [(record["id"], record["description"]) for record in records],
+            """
+            MATCH (e:__Entity__ {id: item.id})
+            SET e.description_embedding = item.embedding
+            """,
+            embeddings=embeddings
+        )
+        checkpoint["last_id"] = records[-1]["id"]
+        checkpoint["embedded"] += stats["written"]
+        checkpoint["failed"] += stats["failed"]
+        save_checkpoint(checkpoint, checkpoint_path)
+        print(f"Checkpoint: {checkpoint['embedded']} entities embedded, last id {checkpoint['last_id']}")
+    
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return checkpoint
+
+def embedding_dimensions_benchmark(queries: List[str] = ("Who is Scrooge?", "What happens on Christmas Eve?",
+                                                            "Who is Tiny Tim?", "Who visits Scrooge at night?"),
+                                   dimensions: Tuple[int, ...] = (256, 512, 1024, EMBEDDING_MODEL_DIMENSIONS),
+                                   k: int = 10, runs: int = 5) -> Dict[int, Dict[str, float]]:
+    """
+    Recall@k, memory and search latency of reduced-dimension entity
+    embeddings, compared with full-size ones.
+
+    Entity vectors come from the embedding store (full size, so every
+    reduction is measured from the same vectors) and are searched by an
+    exact in-process scan; recall is the overlap with the full-size top k.
+    """
+    store = get_embedding_store()
+    entity_df = db_query("MATCH (e:__Entity__) WHERE e.description IS NOT NULL "
+                         "RETURN e.id AS id, e.description AS description")
+    hashes = [text_hash(truncate_to_tokens(description, EMBEDDING_MAX_INPUT_TOKENS))
+              for description in entity_df["description"]]
+    stored = store.get_many(embedding_model_key(), hashes) if store else {}
+    full = np.asarray([stored[digest] for digest in hashes if digest in stored], dtype=np.float32)
+    if not len(full):
+        print("No stored entity embeddings; run the importer first")
+        return {}
+    print(f"Benchmarking {len(full)} of {len(hashes)} entities with stored embeddings")
+    query_vectors = np.asarray(get_embeddings_client().embed_documents(list(queries)), dtype=np.float32)
+
+    def reduce(matrix, size):
+        reduced = matrix[:, :size]
+        return reduced / np.linalg.norm(reduced, axis=1, keepdims=True)
+
+    unit = reduce(full, full.shape[1])
+    expected = [set(np.argsort(-(unit @ query))[:k]) for query in query_vectors]
+    results = {}
+    for size in dimensions:
+        entities, reduced_queries = reduce(full, size), reduce(query_vectors, size)
+        timings, recall = [], []
+        for query, exact in zip(reduced_queries, expected):
+            for _ in range(runs):
+                start = time.perf_counter()
+                top = np.argpartition(-(entities @ query), min(k, len(entities)) - 1)[:k]
+                timings.append(time.perf_counter() - start)
+            recall.append(len(exact.intersection(top)) / len(exact))
+        results[size] = {
+            "recall": float(np.mean(recall)),
+            "bytes_per_entity": size * 4,
+            "index_megabytes": len(full) * size * 4 / 1024 / 1024,
+            "scan_ms": float(np.median(timings)) * 1000,
+        }
+        print(f"{size} dimensions: recall@{k} {results[size]['recall']:.3f}, "
+              f"{results[size]['bytes_per_entity']} bytes/entity ({results[size]['index_megabytes']:.1f} MB), "
+              f"scan {results[size]['scan_ms']:.2f} ms")
+    return results
+
+def process_community_embeddings():
+    """
+    Embed community report summaries so global search can pre-filter
+    communities by similarity to the query
+    """
+    with get_driver(DB_CONFIG).session(database=DB_CONFIG["database"]) as session:
+        result = session.run(
+            """
+            MATCH (c:__Community__)
+            WHERE c.summary_embedding IS NULL AND coalesce(c.summary, c.full_content) IS NOT NULL
+            RETURN c.community AS id, coalesce(c.summary, c.full_content) AS text
+            """
+        )
+        communities = [(record["id"], record["text"]) for record in result]
     
-    # Update database with embeddings
-    print(f"Updating database with {len(entity_embeddings)} embeddings...")
-    batch_update_embeddings(entity_embeddings)
+    if not communities:
+        print("No community reports found that need embeddings.")
+        return
+    
+    run_async(embed_and_write(
+        communities,
+        """
+        MATCH (c:__Community__ {community: item.id})
+        SET c.summary_embedding = item.embedding
+        """
+    ))
+
+def process_entity_embeddings(source="database", graph_folder=None):
+    """
+    Main function to process entity embeddings
+    """
+    print("Fetching entities...")
+    
+    # Stream entities from the database page by page
+    if source == "database":
+        checkpoint = run_async(backfill_entity_embeddings())
+        print(f"Embedded {checkpoint['embedded']} entities ({checkpoint['failed']} failed)")
+        print("Done!")
+        return
+    
+    # Alternatively stream them from the parquet file
+    entities = get_entities_from_parquet(graph_folder)
+    
+    # Embed in concurrent batches and write them as they complete
+    run_async(embed_and_write(
+        entities,
+        """
+        MATCH (e:__Entity__ {id: item.id})
+        SET e.description_embedding = item.embedding
+        """
+    ))
     
     print("Done!")
 
-def import_microsoft_graph(graph_folder: str):
-    """Main function to orchestrate the import process."""
+ENTITY_CONTEXT_STATEMENT = """
+MATCH (e:__Entity__ {id: value.id})
+CALL {
+    WITH e
+    MATCH (e)<-[:HAS_ENTITY]-(c:__Chunk__)
+    WITH c ORDER BY COUNT { (c)-[:HAS_ENTITY]->() } DESC, c.id LIMIT """ + str(NEIGHBORHOOD_CHUNKS) + """
+    RETURN collect(c.id) AS chunks
+}
+CALL {
+    WITH e
+    MATCH (e)-[:IN_COMMUNITY]->(c:__Community__)
+    WITH c ORDER BY c.rank, c.weight DESC LIMIT """ + str(NEIGHBORHOOD_REPORTS) + """
+    RETURN collect({id: c.community, text: c.summary, rank: c.rank, weight: c.weight}) AS reports
+}
+CALL {
+    WITH e
+    MATCH (e)-[r:RELATED]-(m)
+    WITH r, m ORDER BY r.rank, r.weight DESC LIMIT """ + str(NEIGHBORHOOD_RELATIONSHIPS) + """
+    RETURN collect({id: r.id, other: m.id, text: r.description, rank: r.rank, weight: r.weight}) AS relationships
+}
+SET e.neighborhood = apoc.convert.toJson({
+    chunks: chunks, reports: reports, relationships: relationships,
+    limits: {chunks: """ + str(NEIGHBORHOOD_CHUNKS) + """, reports: """ + str(NEIGHBORHOOD_REPORTS) + """,
+             relationships: """ + str(NEIGHBORHOOD_RELATIONSHIPS) + """}
+})
+"""
+
+def build_entity_contexts(rebuild: bool = True) -> int:
+    """
+    Materializes each entity's local search neighborhood (top chunk ids,
+    community reports and relationships) as a JSON record in e.neighborhood,
+    so local search reads it with the seed lookup instead of traversing.
+
+    Args:
+        rebuild: Rebuild every record; otherwise only entities whose record
+            was dropped because their neighborhood changed
+
+    Returns:
+        Number of records written
+    """
+    entity_df = db_query(
+        "MATCH (e:__Entity__) WHERE $rebuild OR e.neighborhood IS NULL RETURN e.id AS id",
+        {"rebuild": rebuild},
+    )
+    if entity_df.empty:
+        return 0
+    return batched_import(ENTITY_CONTEXT_STATEMENT, entity_df, writers=IMPORT_WRITERS)
+
+class ImportStage(NamedTuple):
+    """A step of the import and the stages whose writes it needs"""
+    name: str
+    run: Callable[[str], Optional[int]]
+    depends_on: Tuple[str, ...] = ()
+
+# Real data dependencies between import steps. Chunks attach to documents,
+# entities to chunks, and relationships and community membership to
+# entities (membership is resolved from the parquet files); community reports and findings only need the
+# constraints, parent/child community links need both kinds of community
+# nodes, and the vector and full-text indexes can be built at any time.
+# Embeddings are written only after the vector index stage, which clears
+# vectors of another size when it resizes the index; both embedding stages
+# then fill in every missing vector, including the cleared ones.
+IMPORT_STAGES = [
+    ImportStage("constraints", lambda graph_folder: create_constraints()),
+    ImportStage("documents", import_documents, ("constraints",)),
+    ImportStage("text_units", import_text_units, ("documents",)),
+    ImportStage("entities", import_entities, ("text_units",)),
+    ImportStage("relationships", import_relationships, ("entities",)),
+    ImportStage("communities", import_communities, ("entities",)),
+    ImportStage("community_reports", import_community_reports, ("constraints",)),
+    ImportStage("community_hierarchy", import_community_hierarchy, ("communities", "community_reports")),
+    ImportStage("vector_index", lambda graph_folder: create_vector_index(), ("constraints",)),
+    ImportStage("fulltext_index", lambda graph_folder: create_fulltext_index(), ("constraints",)),
+    ImportStage("entity_embeddings", lambda graph_folder: process_entity_embeddings(source="database"),
+                ("entities", "vector_index")),
+    ImportStage("community_embeddings", lambda graph_folder: process_community_embeddings(),
+                ("community_reports", "vector_index")),
+    ImportStage("entity_context", lambda graph_folder: build_entity_contexts(),
+                ("relationships", "communities", "community_reports")),
+]
+
+def run_import_stages(graph_folder: str, stages: List[ImportStage] = IMPORT_STAGES,
+                      max_parallel: int = IMPORT_PARALLEL_STAGES,
+                      hashes: Optional[Dict[str, List[pd.DataFrame]]] = None) -> Dict[str, Dict]:
+    """
+    Runs import stages as a DAG, starting each stage as soon as the stages
+    it depends on have finished.
+
+    Args:
+        graph_folder: GraphRAG project folder containing output/*.parquet
+        stages: Stages with their dependencies
+        max_parallel: Maximum stages running at once
+        hashes: Collects the manifest row hashes of the stages named after
+            an import table (see IMPORT_TABLE_KEYS) as they import it
+
+    Returns:
+        Per-stage seconds, rows and rows/second
+    """
+    pending = {stage.name: stage for stage in stages}
+    unknown = {dep for stage in stages for dep in stage.depends_on} - pending.keys()
+    if unknown:
+        raise ValueError(f"Unknown import stage dependencies: {sorted(unknown)}")
+
+    def timed(stage: ImportStage):
+        start_time = time.time()
+        if hashes is not None and stage.name in IMPORT_TABLE_KEYS:
+            rows = stage.run(graph_folder, hashes=hashes) or 0
+        else:
+            rows = stage.run(graph_folder) or 0
+        return rows, time.time() - start_time
+
+    done, running, report = set(), {}, {}
+    start_time = time.time()
+    with ThreadPoolExecutor(max_workers=max_parallel) as pool:
+        while pending or running:
+            for name, stage in list(pending.items()):
+                if all(dep in done for dep in stage.depends_on):
+                    del pending[name]
+                    running[pool.submit(timed, stage)] = name
+                    print(f"Stage {name} started")
+            if not running:
+                raise ValueError(f"Import stages with circular dependencies: {sorted(pending)}")
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                rows, seconds = future.result()
+                done.add(name)
+                report[name] = {
+                    "seconds": round(seconds, 2),
+                    "rows": rows,
+                    "rows_per_second": round(rows / seconds, 1) if seconds > 0 else None,
+                }
+                print(f"Stage {name} finished: {rows} rows in {seconds:.2f} seconds "
+                      f"({report[name]['rows_per_second']} rows/s)")
+
+    print(f"Import finished in {time.time() - start_time:.2f} seconds")
+    return report
+
+def load_import_tables(graph_folder: str) -> Dict[str, pd.DataFrame]:
+    """
+    The rows each import stage writes, keyed by table name. Relationships
+    carry their endpoint names and communities their member entity names,
+    so a change in either shows up in the row hashes.
+    """
+    output = f'{graph_folder}/output'
+    ids = entity_ids_by_name(graph_folder)
+    rel_df = pd.read_parquet(f'{output}/relationships.parquet',
+                             columns=["id", "human_readable_id", "source", "target", "description", "weight", "text_unit_ids"])
+    rel_df = resolve_relationships(rel_df, ids)
+    community_df = pd.read_parquet(f'{output}/communities.parquet',
+                                   columns=["id", "level", "title", "relationship_ids"])
+    return {
+        "documents": pd.read_parquet(f'{output}/documents.parquet', columns=["id", "title"]),
+        "text_units": pd.read_parquet(f'{output}/text_units.parquet',
+                                      columns=["id", "text", "n_tokens", "document_ids"]),
+        "entities": entity_rows(pd.read_parquet(f'{output}/entities.parquet',
+                                                columns=["id", "human_readable_id", "title", "type",
+                                                         "description", "text_unit_ids"])),
+        "relationships": rel_df,
+        "communities": community_rows(community_df, community_memberships(community_df, rel_df)),
+        "community_reports": pd.read_parquet(f'{output}/community_reports.parquet',
+                                             columns=["id", "community", "level", "title", "summary", "findings",
+                                                      "rank", "rating_explanation", "full_content"]),
+        "community_hierarchy": community_hierarchy(graph_folder),
+    }
+
+# Key column of each import table. GraphRAG assigns new entity and
+# relationship ids on every re-index, so those are keyed by entity name and
+# by (source, target) name pair instead.
+IMPORT_TABLE_KEYS = {
+    "documents": "id",
+    "text_units": "id",
+    "entities": "name",
+    "relationships": "pair",
+    "communities": "id",
+    "community_reports": "community",
+    "community_hierarchy": "child",
+}
+
+# Columns left out of the row hashes because a re-index changes them even
+# when the row itself is unchanged
+IMPORT_VOLATILE_COLUMNS = {
+    "entities": ("id", "human_readable_id"),
+    "relationships": ("id", "human_readable_id", "source_id", "target_id"),
+}
+
+def import_hashes(tables: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    return {name: row_hashes(df, IMPORT_TABLE_KEYS[name], IMPORT_VOLATILE_COLUMNS.get(name, ()))
+            for name, df in tables.items()}
+
+def collected_hashes(hashes: Dict[str, List[pd.DataFrame]]) -> Dict[str, pd.DataFrame]:
+    """Joins the per-batch row hashes recorded during an import, one table per import table"""
+    empty = pd.DataFrame({"key": pd.Series([], dtype=object), "hash": np.array([], dtype=np.uint64)})
+    return {name: pd.concat(hashes.get(name) or [empty], ignore_index=True) for name in IMPORT_TABLE_KEYS}
+
+# Delta import: what to remove before changed rows are re-written (links
+# and labels the upsert statements only ever add), and how rows that
+# disappeared are deleted. All run as "UNWIND $rows AS value " + statement.
+# Entities are found by name and relationships by their endpoint names
+# (see IMPORT_TABLE_KEYS); both keep the id they were created with.
+DELTA_CLEAR_STATEMENTS = {
+    "text_units": """
+    MATCH (c:__Chunk__ {id: value.id})-[r:PART_OF]->()
+    DELETE r
+    """,
+    "entities": """
+    MATCH (e:__Entity__ {name: value.name})
+    OPTIONAL MATCH (e)<-[r:HAS_ENTITY]-()
+    DELETE r
+    WITH DISTINCT e
+    REMOVE e.human_readable_id, e.description, e.description_embedding
+    WITH e
+    CALL apoc.create.removeLabels(e, [label IN labels(e) WHERE label <> '__Entity__']) YIELD node
+    RETURN count(node) AS cleared
+    """,
+    "relationships": """
+    WITH apoc.convert.fromJsonList(value.pair) AS pair
+    MATCH (:__Entity__ {name: pair[0]})-[r:RELATED]->(:__Entity__ {name: pair[1]})
+    REMOVE r.weight, r.human_readable_id, r.description, r.text_unit_ids
+    """,
+    "communities": """
+    MATCH (c:__Community__ {community: value.id})
+    OPTIONAL MATCH (c)<-[r:IN_COMMUNITY]-()
+    DELETE r
+    """,
+    "community_reports": """
+    MATCH (c:__Community__ {community: value.community})
+    OPTIONAL MATCH (c)-[:HAS_FINDING]->(f:Finding)
+    DETACH DELETE f
+    WITH DISTINCT c
+    REMOVE c.summary_embedding
+    """,
+    "community_hierarchy": """
+    MATCH (:__Community__ {community: value.child})<-[r:HAS_CHILD]-()
+    DELETE r
+    """,
+}
+
+# Entities whose neighborhood record a changed or deleted row affects. Run
+# before the delta writes (old neighbors) and after them (new neighbors).
+DELTA_STALE_CONTEXT_STATEMENTS = {
+    # Entities sharing a chunk with a changed one too: the chunk's entity
+    # count ranks it in their records
+    "entities": """
+    MATCH (e:__Entity__ {name: value.name})
+    OPTIONAL MATCH (e)<-[:HAS_ENTITY]-(:__Chunk__)-[:HAS_ENTITY]->(other:__Entity__)
+    REMOVE e.neighborhood, other.neighborhood
+    """,
+    "relationships": """
+    WITH apoc.convert.fromJsonList(value.pair) AS pair
+    MATCH (e:__Entity__) WHERE e.name IN pair
+    REMOVE e.neighborhood
+    """,
+    "communities": "MATCH (:__Community__ {community: value.id})<-[:IN_COMMUNITY]-(e:__Entity__) REMOVE e.neighborhood",
+    "community_reports": """
+    MATCH (:__Community__ {community: value.community})<-[:IN_COMMUNITY]-(e:__Entity__)
+    REMOVE e.neighborhood
+    """,
+}
+
+DELTA_DELETE_STATEMENTS = {
+    "community_hierarchy": """
+    MATCH (:__Community__ {community: value.child})<-[r:HAS_CHILD]-()
+    DELETE r
+    """,
+    "community_reports": """
+    MATCH (c:__Community__ {community: value.community})
+    OPTIONAL MATCH (c)-[:HAS_FINDING]->(f:Finding)
+    DETACH DELETE f
+    WITH DISTINCT c
+    REMOVE c.rank, c.rating_explanation, c.full_content, c.summary, c.summary_embedding
+    WITH c WHERE NOT (c)<-[:IN_COMMUNITY]-()
+    DETACH DELETE c
+    """,
+    "communities": """
+    MATCH (c:__Community__ {community: value.id})
+    OPTIONAL MATCH (c)-[:HAS_FINDING]->(f:Finding)
+    DETACH DELETE f, c
+    """,
+    "relationships": """
+    WITH apoc.convert.fromJsonList(value.pair) AS pair
+    MATCH (:__Entity__ {name: pair[0]})-[r:RELATED]->(:__Entity__ {name: pair[1]})
+    DELETE r
+    """,
+    "entities": "MATCH (e:__Entity__ {name: value.name}) DETACH DELETE e",
+    "text_units": "MATCH (c:__Chunk__ {id: value.id}) DETACH DELETE c",
+    "documents": "MATCH (d:__Document__ {id: value.id}) DETACH DELETE d",
+}
+
+def delta_import_graph(graph_folder: str) -> Dict[str, Dict[str, int]]:
+    """
+    Imports only what changed since the last import into DB_CONFIG.
+
+    Rows are compared with the manifest of row hashes saved by the previous
+    import. Rows that disappeared are deleted first (so a renamed entity
+    doesn't trip the name constraint), then new and changed rows are
+    cleared and re-written in dependency order. Changed entities lose their
+    description embedding, so the backfill re-embeds only those (and the
+    embedding store skips the provider when the description text is the
+    same). Entities and relationships are compared by name, not by the ids
+    GraphRAG reassigns on every run. Neighborhood records are rebuilt only for entities next to a
+    change. Without a manifest this is a full import.
+
+    Args:
+        graph_folder: GraphRAG project folder containing output/*.parquet
+
+    Returns:
+        {table: {"changed": n, "deleted": n}}
+    """
+    start_time = time.time()
+    database = db_identity(DB_CONFIG)
+    tables = load_import_tables(graph_folder)
+    hashes = import_hashes(tables)
+    manifest = load_manifest(graph_folder, database)
+
+    changes = {}
+    for name, new in hashes.items():
+        changed, deleted = diff_hashes(manifest.get(name), new)
+        changes[name] = (changed, deleted)
+        print(f"{name}: {len(changed)} new or changed, {len(deleted)} deleted")
+
     create_constraints()
-    import_documents(graph_folder)
-    import_text_units(graph_folder)
-    import_entities(graph_folder)
-    import_relationships(graph_folder)
-    import_communities(graph_folder)
-    import_community_reports(graph_folder)
-    create_vector_index()
-    process_entity_embeddings(source="database")
+    resized = create_vector_index()
+    create_fulltext_index()
+
+    def mark_stale_contexts(with_deleted: bool):
+        for name, statement in DELTA_STALE_CONTEXT_STATEMENTS.items():
+            changed, deleted = changes[name]
+            keys = np.concatenate([changed, deleted]) if with_deleted else changed
+            if len(keys):
+                batched_import(statement, pd.DataFrame({IMPORT_TABLE_KEYS[name]: keys}), writers=IMPORT_WRITERS)
+
+    mark_stale_contexts(with_deleted=True)
+
+    for name in DELTA_DELETE_STATEMENTS:
+        deleted = changes[name][1]
+        if len(deleted):
+            key = IMPORT_TABLE_KEYS[name]
+            batched_import(DELTA_DELETE_STATEMENTS[name], pd.DataFrame({key: deleted}), writers=IMPORT_WRITERS)
+
+    def changed_rows(name: str) -> pd.DataFrame:
+        df = tables[name]
+        return df[df[IMPORT_TABLE_KEYS[name]].isin(changes[name][0])]
+
+    def upsert(name: str, statement: str, **kwargs) -> pd.DataFrame:
+        df = changed_rows(name)
+        if len(df):
+            if name in DELTA_CLEAR_STATEMENTS:
+                batched_import(DELTA_CLEAR_STATEMENTS[name], df[[IMPORT_TABLE_KEYS[name]]], writers=IMPORT_WRITERS)
+            batched_import(statement, df, writers=IMPORT_WRITERS, **kwargs)
+        return df
+
+    upsert("documents", DOCUMENT_STATEMENT)
+    upsert("text_units", TEXT_UNIT_STATEMENT, conflict_key=lambda df: df["document_ids"].str[0])
+    upsert("entities", ENTITY_STATEMENT, conflict_key=lambda df: df["text_unit_ids"].str[0])
+    upsert("relationships", RELATIONSHIP_STATEMENT, conflict_key=lambda df: df["source_id"])
+    communities = upsert("communities", COMMUNITY_STATEMENT)
+    if len(communities):
+        members = communities[["id", "entities"]].explode("entities").dropna()
+        batched_import(MEMBERSHIP_STATEMENT,
+                       pd.DataFrame({"entity": members["entities"], "community": members["id"]}),
+                       writers=IMPORT_WRITERS, conflict_key=lambda df: df["community"])
+    reports = upsert("community_reports", COMMUNITY_REPORT_STATEMENT)
+    upsert("community_hierarchy", COMMUNITY_HIERARCHY_STATEMENT, conflict_key=lambda df: df["parent"])
+
+    mark_stale_contexts(with_deleted=False)
+    build_entity_contexts(rebuild=False)
+
+    # A resized index cleared every vector, not just the changed ones
+    if len(reports) or resized:
+        process_community_embeddings()
+    if len(changes["entities"][0]) or resized:
+        process_entity_embeddings(source="database")
+
+    if resized or any(len(changed) or len(deleted) for changed, deleted in changes.values()):
+        community_report_df = tables["community_reports"]
+        get_map_result_cache().invalidate_changed(db_identity(DB_CONFIG), {
+            str(community): content_hash(full_content)
+            for community, full_content in zip(community_report_df["community"], community_report_df["full_content"])
+        })
+        invalidate_search_cache(DB_CONFIG)
+        refresh_entity_ann_index(DB_CONFIG)
+
+    save_manifest(graph_folder, database, hashes)
+    print(f"Delta import finished in {time.time() - start_time:.2f} seconds")
+    return {name: {"changed": len(changed), "deleted": len(deleted)} for name, (changed, deleted) in changes.items()}
+
+def import_microsoft_graph(graph_folder: str, delta: bool = False):
+    """Main function to orchestrate the import process."""
+    if delta:
+        return delta_import_graph(graph_folder)
+    hashes = {}
+    run_import_stages(graph_folder, hashes=hashes)
+    invalidate_search_cache(DB_CONFIG)
+    refresh_entity_ann_index(DB_CONFIG)
+    # Baseline for the next delta import, hashed from the batches as they were imported
+    save_manifest(graph_folder, db_identity(DB_CONFIG), collected_hashes(hashes))
 
 
 if __name__ == "__main__":
-    import_microsoft_graph("ragtest")
\ No newline at end of file
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    import_microsoft_graph("ragtest", delta=os.getenv("IMPORT_DELTA", "").lower() in ("1", "true"))
\ No newline at end of file
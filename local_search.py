@@ -1,18 +1,37 @@
 import os
-from typing import Dict, List
-import pandas as pd
-from neo4j import Result
-from langchain_community.graphs import Neo4jGraph
+import re
+import json
+import time
+import logging
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_openai import AzureChatOpenAI, AzureOpenAIEmbeddings
-from langchain_community.vectorstores import Neo4jVector
-from langchain_openai import OpenAIEmbeddings
-from neo4j import GraphDatabase
+from neo4j.exceptions import ClientError
 import asyncio
-from knowledge_graph_creator import DB_CONFIG, db_query
+import numpy as np
+from functools import lru_cache
 from dotenv import load_dotenv
 
+# Load environment variables before the modules below read their settings
+load_dotenv()
+
+from neo4j_drivers import close_all_async, get_async_driver, get_driver, run_sync
+from context_builder import build_local_context
+from ann_index import get_entity_ann_index
+from embedding_models import QueryEmbeddings, ReducedEmbeddings
+from search_cache import (
+    NeighborhoodCache,
+    SemanticCache,
+    agraph_version,
+    cache_scope,
+    get_neighborhood_cache,
+    get_search_cache,
+    graph_version,
+)
+
+logger = logging.getLogger(__name__)
 
 TOP_CHUNKS = 3
 TOP_COMMUNITIES = 3
@@ -20,8 +39,31 @@ TOP_OUTSIDE_RELS = 10
 TOP_INSIDE_RELS = 10
 TOP_ENTITIES = 10
 
+# Token budget for the context pasted into the reduce prompt
+LOCAL_CONTEXT_TOKENS = int(os.getenv("LOCAL_SEARCH_CONTEXT_TOKENS", "12000"))
+
+
+# Candidate chunks kept per seed entity when counting how many seeds share a
+# chunk (matches the importer's NEIGHBORHOOD_CHUNKS so its records are used)
+CHUNK_CANDIDATES_PER_ENTITY = int(os.getenv("LOCAL_CHUNK_CANDIDATES_PER_ENTITY", "200"))
 
-# Vector store setup
+# Reciprocal rank fusion of vector and full-text seeds: an entity scores
+# sum(1 / (LOCAL_RRF_K + rank)) over the rankings it appears in
+RRF_K = int(os.getenv("LOCAL_RRF_K", "60"))
+
+# A query is seeded from the entities it names, without an embedding, only
+# when their names make up at least this share of its content words
+# ("Who is Scrooge?"); otherwise the names just lead the full-text ranking
+NAMED_ENTITY_MIN_COVERAGE = float(os.getenv("LOCAL_NAMED_ENTITY_MIN_COVERAGE", "0.75"))
+# Words left out when measuring that share
+QUERY_STOP_WORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "who", "whom", "whose", "what", "which", "when",
+    "where", "why", "how", "do", "does", "did", "of", "in", "on", "at", "to", "for", "and", "or", "about",
+    "tell", "me", "describe", "explain", "s",
+}
+
+# Previous single-statement retrieval, kept as the baseline for
+# local_retrieval_benchmark()
 lc_retrieval_query = """
 WITH collect(node) as nodes
 // Entity - Text Unit Mapping
@@ -72,8 +114,333 @@ RETURN {Chunks: text_mapping, Reports: report_mapping,
        Entities: entities} AS text, 1.0 AS score, {} AS metadata
 """
 
-def local_search(neo4j_config: Dict, query: str, k: int = 5) -> List[Dict]:
-    REDUCE_SYSTEM_PROMPT = """
+# Same entry point Neo4jVector uses for index-backed similarity search
+vector_index_query = """
+CALL db.index.vector.queryNodes($index, $k, $embedding) YIELD node, score
+"""
+
+seed_entities_query = vector_index_query + """
+RETURN node.id AS id, node.description AS description, node.neighborhood AS neighborhood, score
+"""
+
+# Seeds found by the in-process index, in its ranking order
+seed_entities_by_id_query = """
+UNWIND $hits AS hit
+MATCH (node:__Entity__ {id: hit.id})
+RETURN node.id AS id, node.description AS description, node.neighborhood AS neighborhood, hit.score AS score
+"""
+
+# Keyword seeds from the importer's full-text index on entity names and descriptions
+fulltext_entities_query = """
+CALL db.index.fulltext.queryNodes($index, $text, {limit: $k}) YIELD node, score
+RETURN node.id AS id, node.name AS name, node.description AS description, node.neighborhood AS neighborhood, score
+"""
+
+# Per-entity lookups. Each returns one (id, items) row per entity that has
+# any, with the top-K applied inside the subquery for that entity alone.
+# Chunks mentioning the most entities come first, in the same order as the
+# importer's neighborhood records.
+entity_chunks_query = """
+UNWIND $ids AS id
+MATCH (n:__Entity__ {id: id})
+CALL {
+    WITH n
+    MATCH (n)<-[:HAS_ENTITY]-(c:__Chunk__)
+    WITH c ORDER BY COUNT { (c)-[:HAS_ENTITY]->() } DESC, c.id LIMIT $limit
+    RETURN c.id AS chunk
+}
+RETURN id, collect(chunk) AS items
+"""
+
+chunk_texts_query = """
+UNWIND $ids AS id
+MATCH (c:__Chunk__ {id: id})
+RETURN id, c.text AS items
+"""
+
+entity_reports_query = """
+UNWIND $ids AS id
+MATCH (n:__Entity__ {id: id})
+CALL {
+    WITH n
+    MATCH (n)-[:IN_COMMUNITY]->(c:__Community__)
+    RETURN c
+    ORDER BY c.rank, c.weight DESC
+    LIMIT $limit
+}
+RETURN id, collect({id: c.community, text: c.summary, rank: c.rank, weight: c.weight}) AS items
+"""
+
+entity_relationships_query = """
+UNWIND $ids AS id
+MATCH (n:__Entity__ {id: id})
+CALL {
+    WITH n
+    MATCH (n)-[r:RELATED]-(m)
+    RETURN r, m
+    ORDER BY r.rank, r.weight DESC
+    LIMIT $limit
+}
+RETURN id, collect({id: r.id, other: m.id, text: r.description, rank: r.rank, weight: r.weight}) AS items
+"""
+
+# Relationships between seed entities: both endpoints are bound, so each
+# pair is an expand-into check instead of a walk over a hub's neighbors
+inside_relationships_query = """
+MATCH (n:__Entity__) WHERE n.id IN $ids
+WITH collect(n) AS seeds
+UNWIND seeds AS n
+UNWIND seeds AS m
+WITH n, m WHERE n.id < m.id
+MATCH (n)-[r:RELATED]-(m)
+RETURN DISTINCT r.id AS id, r.description AS text, r.rank AS rank, r.weight AS weight
+ORDER BY rank, weight DESC
+LIMIT $limit
+"""
+
+
+def _words(text: str) -> List[str]:
+    return re.findall(r"\w+", text.lower())
+
+
+def fulltext_query(query: str) -> str:
+    """The query's words as a Lucene query (any word may match, so no syntax to escape)"""
+    return " ".join(_words(query))
+
+
+def fulltext_entities(neo4j_config: Dict, query: str, k: int) -> List:
+    """
+    The k entities whose name or description best match the query's words,
+    or [] when the full-text index is missing (graphs imported before it).
+    """
+    text = fulltext_query(query)
+    if not text:
+        return []
+    try:
+        records, _, _ = get_driver(neo4j_config).execute_query(
+            fulltext_entities_query,
+            index=neo4j_config.get("fulltext_index_name", "entity_fulltext"), text=text, k=k,
+            database_=neo4j_config.get("database", "neo4j"),
+        )
+        return records
+    except ClientError as e:
+        logger.warning(f"Full-text entity search unavailable, using vector search only: {e}")
+        return []
+
+
+async def afulltext_entities(neo4j_config: Dict, query: str, k: int) -> List:
+    """Async variant of fulltext_entities()"""
+    text = fulltext_query(query)
+    if not text:
+        return []
+    try:
+        return await _read(neo4j_config, fulltext_entities_query,
+                           index=neo4j_config.get("fulltext_index_name", "entity_fulltext"), text=text, k=k)
+    except ClientError as e:
+        logger.warning(f"Full-text entity search unavailable, using vector search only: {e}")
+        return []
+
+
+def _named_hits(query: str, hits: List) -> List:
+    # Hits whose whole name appears in the query as a phrase
+    text = f" {' '.join(_words(query))} "
+    return [hit for hit in hits if hit["name"] and _words(hit["name"])
+            and f" {' '.join(_words(hit['name']))} " in text]
+
+
+def named_entity_seeds(query: str, hits: List) -> List:
+    """
+    Full-text hits with the entities the query names exactly (the whole name
+    appears in it as a phrase) moved first, or [] when it names none.
+    """
+    named = _named_hits(query, hits)
+    if not named:
+        return []
+    named_ids = {hit["id"] for hit in named}
+    return named + [hit for hit in hits if hit["id"] not in named_ids]
+
+
+def names_cover_query(query: str, hits: List, min_coverage: float = NAMED_ENTITY_MIN_COVERAGE) -> bool:
+    """
+    True when the entities the query names exactly account for at least
+    min_coverage of its content words, so the names alone say what it is
+    about. A common word that happens to be an entity name does not.
+    """
+    content = [word for word in _words(query) if word not in QUERY_STOP_WORDS]
+    if not content:
+        return False
+    named_words = {word for hit in _named_hits(query, hits) for word in _words(hit["name"])}
+    return sum(word in named_words for word in content) / len(content) >= min_coverage
+
+
+def reciprocal_rank_fusion(rankings: List[List], k: int, rrf_k: int = RRF_K) -> List:
+    """Merges ranked seed lists by reciprocal rank, keeping the first record seen for each entity"""
+    scores, records = {}, {}
+    for ranking in rankings:
+        for rank, record in enumerate(ranking, start=1):
+            scores[record["id"]] = scores.get(record["id"], 0) + 1 / (rrf_k + rank)
+            records.setdefault(record["id"], record)
+    # sorted() is stable, so ties keep the order entities were first seen in
+    return [records[entity_id] for entity_id in sorted(scores, key=scores.get, reverse=True)[:k]]
+
+
+def _cypher_order(item: Dict) -> Tuple:
+    # ORDER BY rank, weight DESC: nulls sort last ascending and first descending
+    rank, weight = item.get("rank"), item.get("weight")
+    return (rank is None, rank if rank is not None else 0, weight is not None, -(weight or 0))
+
+
+async def _read(neo4j_config: Dict, query: str, **params) -> List:
+    driver = await get_async_driver(neo4j_config)
+
+    async def read(tx):
+        result = await tx.run(query, **params)
+        return [record async for record in result]
+
+    # One session per lookup: sessions can't be shared by concurrent queries
+    async with driver.session(database=neo4j_config.get("database", "neo4j")) as session:
+        return await session.execute_read(read)
+
+
+async def _cached_lookup(neo4j_config: Dict, scope: Tuple[str, str], lookup: str, query: str,
+                         keys: List[str], cache: NeighborhoodCache, **params) -> Dict:
+    """Runs a per-key lookup for the keys not already cached, caching empty results too"""
+    found, missing = cache.get_many(scope, lookup, keys)
+    if missing:
+        fetched = {key: None for key in missing}
+        fetched.update({record["id"]: record["items"] for record in await _read(neo4j_config, query, ids=missing, **params)})
+        cache.put_many(scope, lookup, fetched)
+        found.update(fetched)
+    return found
+
+
+async def seed_entities(neo4j_config: Dict, embedding: List[float], k: int, version: str) -> List:
+    """
+    The k entities most similar to the embedding, from the in-process index
+    when one was built for this graph version, otherwise from the Neo4j
+    vector index.
+    """
+    ann = get_entity_ann_index(neo4j_config, version)
+    if ann is not None:
+        hits = ann.search(embedding, k)
+        return await _read(neo4j_config, seed_entities_by_id_query,
+                           hits=[{"id": entity_id, "score": score} for entity_id, score in hits])
+    return await _read(neo4j_config, seed_entities_query, index=neo4j_config.get("index_name", "entity"),
+                       k=k, embedding=embedding)
+
+
+async def avector_search(neo4j_config: Dict, embedding: Optional[List[float]], k: int, params: Dict,
+                         version: Optional[str] = None, cache: Optional[NeighborhoodCache] = None,
+                         text_hits: Optional[List] = None) -> List[Dict]:
+    """
+    Finds the k most similar entities and builds their local context.
+
+    Seeds come from the in-process ANN index when ENTITY_ANN_INDEX_DIR is
+    set and the index matches the graph version (see seed_entities).
+    Full-text hits are merged with them by reciprocal rank fusion; without
+    an embedding (the query is made up of the entities it names) they are
+    the only seeds.
+
+    The seed lookup also returns each seed's neighborhood record written
+    at import time (see build_entity_contexts), which answers the
+    per-entity lookups directly. For seeds without a record, or whose
+    record was built with smaller limits, chunks, community reports, outside
+    and inside relationships are fetched as concurrent queries. Those
+    per-entity results go through the neighborhood cache, so hub entities
+    that seed many queries are only expanded once per graph version.
+
+    Args:
+        neo4j_config: Dictionary containing Neo4j connection details and index_name
+        embedding: The query embedding, or None to seed from text_hits only
+        k: Number of seed entities
+        params: topChunks, topCommunities, topOutsideRels and topInsideRels
+        version: Graph version the cache entries belong to (read when omitted)
+        cache: Neighborhood cache (the per-process one by default)
+        text_hits: Ranked full-text seeds (see fulltext_entities)
+
+    Returns:
+        Context sections ({"Chunks", "Reports", "Relationships", "Entities"})
+    """
+    cache = cache or get_neighborhood_cache()
+    version = version or await agraph_version(neo4j_config)
+    scope = cache_scope(neo4j_config, version, "neighborhood")
+
+    if embedding is None:
+        seeds = (text_hits or [])[:k]
+    else:
+        seeds = await seed_entities(neo4j_config, embedding, k, version)
+        if text_hits:
+            seeds = reciprocal_rank_fusion([seeds, text_hits], k)
+    ids = [seed["id"] for seed in seeds]
+    if not ids:
+        return []
+    records = {seed["id"]: json.loads(seed["neighborhood"]) for seed in seeds if seed["neighborhood"]}
+    seed_ids = set(ids)
+
+    async def per_entity(field: str, query: str, limit: int) -> Dict:
+        # Records built with at least this limit hold the same top-K
+        by_entity = {entity_id: record[field] for entity_id, record in records.items()
+                     if record["limits"][field] >= limit}
+        rest = [entity_id for entity_id in ids if entity_id not in by_entity]
+        if rest:
+            by_entity.update(await _cached_lookup(neo4j_config, scope, f"{field}:{limit}", query, rest, cache,
+                                                  limit=limit))
+        return by_entity
+
+    async def chunks() -> List[str]:
+        by_entity = await per_entity("chunks", entity_chunks_query, CHUNK_CANDIDATES_PER_ENTITY)
+        # Chunks shared by the most seeds first, ties in seed order
+        freq = Counter(chunk for entity_id in ids for chunk in dict.fromkeys(by_entity[entity_id] or []))
+        top = [chunk for chunk, _ in freq.most_common(params["topChunks"])]
+        texts = await _cached_lookup(neo4j_config, scope, "chunk_text", chunk_texts_query, top, cache)
+        return [texts[chunk] for chunk in top if texts[chunk]]
+
+    async def reports() -> List[str]:
+        limit = params["topCommunities"]
+        by_entity = await per_entity("reports", entity_reports_query, limit)
+        unique = {item["id"]: item for entity_id in ids for item in by_entity[entity_id] or []}
+        return [item["text"] for item in sorted(unique.values(), key=_cypher_order)[:limit]]
+
+    async def outside_relationships() -> List[str]:
+        # Up to k-1 of an entity's top relationships can lead to other
+        # seeds, so topOutsideRels + k per entity covers the global top
+        limit = params["topOutsideRels"] + k
+        by_entity = await per_entity("relationships", entity_relationships_query, limit)
+        unique = {item["id"]: item for entity_id in ids for item in by_entity[entity_id] or []
+                  if item["other"] not in seed_ids}
+        return [item["text"] for item in sorted(unique.values(), key=_cypher_order)[:params["topOutsideRels"]]]
+
+    async def inside_relationships() -> List[str]:
+        # A record shorter than its limit lists all of the entity's
+        # relationships. If at most one seed lacks such a complete list,
+        # every relationship between two seeds shows up in a complete one.
+        incomplete = [entity_id for entity_id in ids if entity_id not in records
+                      or len(records[entity_id]["relationships"]) >= records[entity_id]["limits"]["relationships"]]
+        if len(incomplete) <= 1:
+            unique = {item["id"]: item for entity_id, record in records.items() if entity_id not in incomplete
+                      for item in record["relationships"] if item["other"] in seed_ids and item["other"] != entity_id}
+            return [item["text"] for item in sorted(unique.values(), key=_cypher_order)[:params["topInsideRels"]]]
+        rows = await _read(neo4j_config, inside_relationships_query, ids=ids, limit=params["topInsideRels"])
+        return [row["text"] for row in rows]
+
+    chunk_texts, report_texts, outside, inside = await asyncio.gather(
+        chunks(), reports(), outside_relationships(), inside_relationships()
+    )
+    return [{
+        "Chunks": chunk_texts,
+        "Reports": report_texts,
+        "Relationships": outside + inside,
+        "Entities": [seed["description"] for seed in seeds],
+    }]
+
+
+def vector_search(neo4j_config: Dict, embedding: Optional[List[float]], k: int, params: Dict,
+                  version: Optional[str] = None, text_hits: Optional[List] = None) -> List[Dict]:
+    """Sync variant of avector_search(), run on the shared background loop (see run_sync)"""
+    return run_sync(avector_search(neo4j_config, embedding, k, params, version, text_hits=text_hits))
+
+
+REDUCE_SYSTEM_PROMPT = """
     You are a helpful assistant responding to questions about a dataset by synthesizing perspectives from multiple analysts.
 
     Generate a response of the target length and format that responds to the user's question, summarizing all the reports from multiple analysts who focused on different parts of the dataset.
@@ -109,47 +476,261 @@ def local_search(neo4j_config: Dict, query: str, k: int = 5) -> List[Dict]:
     {report_data}
     """
 
-    reduce_prompt = ChatPromptTemplate.from_messages([
-        ("system", REDUCE_SYSTEM_PROMPT),
-        ("human", "{question}"),
-    ])
+reduce_prompt = ChatPromptTemplate.from_messages([
+    ("system", REDUCE_SYSTEM_PROMPT),
+    ("human", "{question}"),
+])
 
-    # Set up LLM
-    llm = AzureChatOpenAI(
-        azure_deployment=os.getenv("DEPLOYMENT_NAME"),
-        temperature=0,
-    )
-    reduce_chain = reduce_prompt | llm | StrOutputParser()
 
+class LocalSearchEngine:
+    """
+    Local search with its LLM, embeddings and reduce chain built once.
 
-    lc_vector = Neo4jVector.from_existing_index(
-        AzureOpenAIEmbeddings(model=os.getenv("DEPLOYMENT_NAME_EMBEDDINGS"),api_key=os.getenv("AZURE_OPENAI_API_KEY_EMBEDDINGS")),      
-        url=neo4j_config["url"],
-        username=neo4j_config["username"],
-        password=neo4j_config["password"],
-        index_name=neo4j_config.get("index_name", "entity"),
-        retrieval_query=lc_retrieval_query
-    )
+    A warm instance is meant to be shared by every request in the process,
+    so per-query latency is only the vector lookup and the reduce call.
+    """
 
+    def __init__(self, llm=None, embeddings=None, context_tokens: int = LOCAL_CONTEXT_TOKENS,
+                 cache: SemanticCache = None):
+        # Set up LLM
+        self.llm = llm or AzureChatOpenAI(
+            azure_deployment=os.getenv("DEPLOYMENT_NAME"),
+            temperature=0,
+        )
+        self.embeddings = QueryEmbeddings(ReducedEmbeddings(embeddings or AzureOpenAIEmbeddings(
+            model=os.getenv("DEPLOYMENT_NAME_EMBEDDINGS"),
+            api_key=os.getenv("AZURE_OPENAI_API_KEY_EMBEDDINGS"),
+        )))
+        self.reduce_chain = reduce_prompt | self.llm | StrOutputParser()
+        self.context_tokens = context_tokens
+        self.cache = cache or get_search_cache()
 
-    report_data = lc_vector.similarity_search(
-        query,
-        k=k,
-        params={
+    @staticmethod
+    def _retrieval_params() -> Dict:
+        return {
             "topChunks": TOP_CHUNKS,
             "topCommunities": TOP_COMMUNITIES,
             "topOutsideRels": TOP_OUTSIDE_RELS,
             "topInsideRels": TOP_INSIDE_RELS,
-        },
-    )
+        }
 
-    final_response = reduce_chain.invoke({
-        "report_data": report_data,
-        "question": query,
-    })
-    
-    return final_response
+    def search(self, neo4j_config: Dict, query: str, k: int = 5) -> str:
+        """
+        Answers a query from the neighborhoods of the k most similar entities.
+
+        Args:
+            neo4j_config: Dictionary containing Neo4j connection details and index_name
+            query: The search query
+            k: Number of seed entities (default: 5)
+
+        Returns:
+            The search results as a string
+        """
+        version = graph_version(neo4j_config)
+        identity, namespace = cache_scope(
+            neo4j_config, version, "local", neo4j_config.get("index_name", "entity"), k
+        )
+        cached = self.cache.get(identity, namespace, query)
+        if cached is not None:
+            return cached
+
+        # A query made up of the entities it names is seeded from the
+        # full-text index alone, without waiting for an embedding. Otherwise
+        # named entities lead the full-text ranking fused with vector seeds.
+        text_hits = fulltext_entities(neo4j_config, query, k)
+        named = named_entity_seeds(query, text_hits)
+        embedding = None
+        if not named or not names_cover_query(query, named):
+            embedding = self.embeddings.embed_query(query)
+            cached = self.cache.get(identity, namespace, query, embedding)
+            if cached is not None:
+                return cached
+
+        sections = vector_search(
+            neo4j_config,
+            embedding,
+            k=k,
+            params=self._retrieval_params(),
+            version=version,
+            text_hits=named or text_hits,
+        )
+        report_data = build_local_context(sections, self.context_tokens)
+
+        final_response = self.reduce_chain.invoke({
+            "report_data": report_data,
+            "question": query,
+        })
+        self.cache.put(identity, namespace, query, embedding, final_response)
+        return final_response
+
+    async def asearch(self, neo4j_config: Dict, query: str, k: int = 5) -> str:
+        """Async variant of search()"""
+        version = await agraph_version(neo4j_config)
+        identity, namespace = cache_scope(
+            neo4j_config, version, "local", neo4j_config.get("index_name", "entity"), k
+        )
+        cached = self.cache.get(identity, namespace, query)
+        if cached is not None:
+            return cached
+
+        text_hits = await afulltext_entities(neo4j_config, query, k)
+        named = named_entity_seeds(query, text_hits)
+        embedding = None
+        if not named or not names_cover_query(query, named):
+            embedding = await self.embeddings.aembed_query(query)
+            cached = self.cache.get(identity, namespace, query, embedding)
+            if cached is not None:
+                return cached
+
+        sections = await avector_search(
+            neo4j_config, embedding, k, self._retrieval_params(), version, text_hits=named or text_hits
+        )
+        report_data = build_local_context(sections, self.context_tokens)
+
+        final_response = await self.reduce_chain.ainvoke({
+            "report_data": report_data,
+            "question": query,
+        })
+        self.cache.put(identity, namespace, query, embedding, final_response)
+        return final_response
+
+
+@lru_cache(maxsize=None)
+def get_local_search_engine() -> LocalSearchEngine:
+    """Returns the per-process LocalSearchEngine, creating it on first use"""
+    return LocalSearchEngine()
+
+
+def local_search(neo4j_config: Dict, query: str, k: int = 5) -> str:
+    return get_local_search_engine().search(neo4j_config, query, k)
+
+
+async def alocal_search(neo4j_config: Dict, query: str, k: int = 5) -> str:
+    return await get_local_search_engine().asearch(neo4j_config, query, k)
+
+
+def local_retrieval_benchmark(neo4j_config: Dict, query: str = "Who is Scrooge?", k: int = 5,
+                              runs: int = 5) -> Dict[str, List[float]]:
+    """
+    Times the single-statement retrieval (lc_retrieval_query) against the
+    split concurrent lookups, with a cold and a warm neighborhood cache.
+    """
+    embedding = get_local_search_engine().embeddings.embed_query(query)
+    params = LocalSearchEngine._retrieval_params()
+    index = neo4j_config.get("index_name", "entity")
+
+    async def run():
+        timings = {"monolithic": [], "split_cold": [], "split_warm": []}
+        try:
+            for _ in range(runs):
+                start = time.perf_counter()
+                await _read(neo4j_config, vector_index_query + lc_retrieval_query,
+                            index=index, k=k, embedding=embedding, **params)
+                timings["monolithic"].append(time.perf_counter() - start)
+
+                cache = NeighborhoodCache()
+                for name in ("split_cold", "split_warm"):
+                    start = time.perf_counter()
+                    await avector_search(neo4j_config, embedding, k, params, cache=cache)
+                    timings[name].append(time.perf_counter() - start)
+        finally:
+            await close_all_async()
+        return timings
+
+    timings = asyncio.run(run())
+    for name, values in timings.items():
+        print(f"{name}: median {sorted(values)[len(values) // 2] * 1000:.1f} ms over {runs} runs")
+    return timings
+
+
+def seed_lookup_benchmark(neo4j_config: Dict, queries: List[str] = ("Who is Scrooge?", "What happens on Christmas Eve?",
+                                                                  "Who is Tiny Tim?", "Who visits Scrooge at night?"),
+                          ks: Tuple[int, ...] = (5, 10, 20, 50), runs: int = 3) -> Dict[int, Dict[str, float]]:
+    """
+    Compares seed lookups in the in-process ANN index with the Neo4j vector
+    index: median latency, and recall@k of each against an exact scan of
+    the index's float32 vectors (plus the overlap of the two result sets).
+    """
+    version = graph_version(neo4j_config)
+    ann = get_entity_ann_index(neo4j_config, version)
+    if ann is None:
+        print("No ANN index for the current graph version; set ENTITY_ANN_INDEX_DIR and re-import")
+        return {}
+    embeddings = get_local_search_engine().embeddings.embed_documents(list(queries))
+    index = neo4j_config.get("index_name", "entity")
+
+    async def neo4j_seeds(embedding, k):
+        rows = await _read(neo4j_config, vector_index_query + "RETURN node.id AS id", index=index, k=k,
+                           embedding=embedding)
+        return [row["id"] for row in rows]
+
+    async def run():
+        results = {}
+        try:
+            for k in ks:
+                timings = {"neo4j": [], "ann": []}
+                recall = {"neo4j": [], "ann": [], "overlap": []}
+                for embedding in embeddings:
+                    query = np.asarray(embedding, dtype=np.float32)
+                    exact = {ann.ids[i] for i in np.argsort(-(ann.vectors @ query))[:k]}
+                    for _ in range(runs):
+                        start = time.perf_counter()
+                        neo4j_ids = await neo4j_seeds(embedding, k)
+                        timings["neo4j"].append(time.perf_counter() - start)
+                        start = time.perf_counter()
+                        ann_ids = [entity_id for entity_id, _ in ann.search(embedding, k)]
+                        timings["ann"].append(time.perf_counter() - start)
+                    recall["neo4j"].append(len(exact.intersection(neo4j_ids)) / len(exact))
+                    recall["ann"].append(len(exact.intersection(ann_ids)) / len(exact))
+                    recall["overlap"].append(len(set(ann_ids).intersection(neo4j_ids)) / max(len(neo4j_ids), 1))
+                results[k] = {
+                    **{f"{name}_ms": float(np.median(values)) * 1000 for name, values in timings.items()},
+                    **{f"{name}_recall": float(np.mean(values)) for name, values in recall.items()},
+                }
+                print(f"k={k}: neo4j {results[k]['neo4j_ms']:.1f} ms (recall {results[k]['neo4j_recall']:.3f}), "
+                      f"ann {results[k]['ann_ms']:.1f} ms (recall {results[k]['ann_recall']:.3f}), "
+                      f"overlap {results[k]['overlap_recall']:.3f}")
+        finally:
+            await close_all_async()
+        return results
+
+    return asyncio.run(run())
+
+
+def query_embedding_benchmark(queries: List[str] = ("Who is Scrooge?", "What happens on Christmas Eve?",
+                                                       "Who is Tiny Tim?", "Who visits Scrooge at night?"),
+                              concurrency: int = 16) -> Dict[str, Dict[str, float]]:
+    """
+    Embeds a burst of concurrent queries (the given ones, repeated up to
+    concurrency) with one request per query, micro-batched without a cache,
+    and from a warm cache. Reports embedding requests and p50 latency.
+    """
+    client = get_local_search_engine().embeddings.embeddings
+    burst = [queries[i % len(queries)] for i in range(concurrency)]
+
+    async def timed(embed, text):
+        start = time.perf_counter()
+        await embed(text)
+        return time.perf_counter() - start
+
+    async def run():
+        batched = QueryEmbeddings(client, max_entries=0)
+        cached = QueryEmbeddings(client)
+        await asyncio.gather(*[cached.aembed_query(text) for text in burst])
+        results = {}
+        for name, embed, metrics in (("unbatched", client.aembed_query, None),
+                                     ("batched", batched.aembed_query, batched.metrics),
+                                     ("cached", cached.aembed_query, cached.metrics)):
+            before = metrics["requests"] if metrics else 0
+            timings = await asyncio.gather(*[timed(embed, text) for text in burst])
+            results[name] = {
+                "requests": metrics["requests"] - before if metrics else len(burst),
+                "p50_ms": float(np.median(timings)) * 1000,
+            }
+            print(f"{name}: {results[name]['requests']} embedding requests, p50 {results[name]['p50_ms']:.1f} ms")
+        return results
 
+    return asyncio.run(run())
 
 
 def local_search_test():
@@ -0,0 +1,345 @@
+import os
+import asyncio
+import atexit
+import hashlib
+import logging
+import threading
+import time
+from typing import Dict, List, Tuple
+from neo4j import AsyncDriver, AsyncGraphDatabase, Driver, GraphDatabase
+
+logger = logging.getLogger(__name__)
+
+# Pool configuration (overridable through the environment)
+MAX_CONNECTION_POOL_SIZE = int(os.getenv("NEO4J_MAX_CONNECTION_POOL_SIZE", "50"))
+CONNECTION_ACQUISITION_TIMEOUT = float(os.getenv("NEO4J_CONNECTION_ACQUISITION_TIMEOUT", "30"))
+MAX_CONNECTION_LIFETIME = float(os.getenv("NEO4J_MAX_CONNECTION_LIFETIME", "3600"))
+LIVENESS_CHECK_TIMEOUT = float(os.getenv("NEO4J_LIVENESS_CHECK_TIMEOUT", "60"))
+HEALTH_CHECK_INTERVAL = float(os.getenv("NEO4J_HEALTH_CHECK_INTERVAL", "30"))
+# Seconds a driver replaced after a failed health check stays open for the
+# sessions still using it
+RETIRED_DRIVER_GRACE = float(os.getenv("NEO4J_RETIRED_DRIVER_GRACE", "300"))
+
+# Pool hit/miss counters, exposed through pool_metrics()
+POOL_METRICS = {
+    "hits": 0,
+    "misses": 0,
+    "health_check_failures": 0,
+    "closed": 0,
+}
+
+_drivers: Dict[Tuple[str, str, str, str], Dict] = {}
+_lock = threading.Lock()
+
+# Async drivers are bound to the event loop that opened them, so they live
+# in their own table keyed by (url, username, database, auth digest, loop).
+_async_drivers: Dict[Tuple, Dict] = {}
+
+# Drivers replaced after a failed health check, as {"key", "driver",
+# "retired_at"} (plus "loop" for async ones). Sessions may still be using
+# them, so each is closed by the first health check of its database at least
+# RETIRED_DRIVER_GRACE seconds later, or by close_all()/close_all_async().
+_retired: List[Dict] = []
+_retired_async: List[Dict] = []
+
+
+def driver_key(db_config: Dict) -> Tuple[str, str, str]:
+    """Returns (url, username, database) for a db_config"""
+    return (db_config["url"], db_config["username"], db_config.get("database", "neo4j"))
+
+
+def _registry_key(db_config: Dict) -> Tuple[str, str, str, str]:
+    # Callers with different passwords for the same database get separate
+    # drivers; the password itself is only kept as a digest.
+    return driver_key(db_config) + (hashlib.sha256(db_config["password"].encode("utf-8")).hexdigest(),)
+
+
+def _has_other_credentials(table: Dict, key: Tuple) -> bool:
+    return any(other[:3] == key[:3] and other[:4] != key[:4] for other in table)
+
+
+def _driver_options() -> Dict:
+    return {
+        "max_connection_pool_size": MAX_CONNECTION_POOL_SIZE,
+        "connection_acquisition_timeout": CONNECTION_ACQUISITION_TIMEOUT,
+        "max_connection_lifetime": MAX_CONNECTION_LIFETIME,
+        "liveness_check_timeout": LIVENESS_CHECK_TIMEOUT,
+    }
+
+
+def _open_driver(key: Tuple[str, str, str, str], db_config: Dict) -> Driver:
+    """Opens a pooled driver and stores it under key. Must hold _lock."""
+    driver = GraphDatabase.driver(
+        db_config["url"],
+        auth=(db_config["username"], db_config["password"]),
+        **_driver_options(),
+    )
+    if _has_other_credentials(_drivers, key):
+        # Other credentials are already pooled for this database, so these
+        # are checked before the driver is registered next to them
+        try:
+            driver.verify_connectivity()
+        except Exception:
+            _close_quietly(driver)
+            raise
+
+    previous = _drivers.pop(key, None)
+    if previous is not None:
+        _retired.append({"key": key, "driver": previous["driver"], "retired_at": time.monotonic()})
+    _drivers[key] = {"driver": driver, "checked_at": time.monotonic()}
+    logger.info(f"Opened Neo4j driver for {key[0]} (user={key[1]}, database={key[2]})")
+    return driver
+
+
+def _close_quietly(driver: Driver):
+    try:
+        driver.close()
+        POOL_METRICS["closed"] += 1
+    except Exception as e:
+        logger.warning(f"Error closing Neo4j driver: {e}")
+
+
+def _take_retired(retired: List[Dict], key: Tuple, loop: asyncio.AbstractEventLoop = None) -> List:
+    """
+    Removes and returns the drivers of key (opened on loop, for async ones)
+    retired at least RETIRED_DRIVER_GRACE seconds ago. Must hold _lock.
+    """
+    cutoff = time.monotonic() - RETIRED_DRIVER_GRACE
+    due = [item for item in retired
+           if item["key"] == key and item.get("loop") is loop and item["retired_at"] <= cutoff]
+    for item in due:
+        retired.remove(item)
+    return [item["driver"] for item in due]
+
+
+def get_driver(db_config: Dict) -> Driver:
+    """
+    Returns the shared pooled driver for a database configuration.
+
+    Drivers are keyed by (url, username, database, password digest) and
+    reused across calls. A driver that has not been used for
+    HEALTH_CHECK_INTERVAL seconds is checked with verify_connectivity() and
+    replaced if the check fails; the replaced driver is left open for the
+    sessions still using it, and closed by a later health check once it has
+    been retired for RETIRED_DRIVER_GRACE seconds.
+
+    Args:
+        db_config: Dictionary containing url, username, password and optionally database
+
+    Returns:
+        A neo4j Driver owned by the registry. Callers must not close it.
+    """
+    key = _registry_key(db_config)
+
+    with _lock:
+        entry = _drivers.get(key)
+        if entry is None:
+            POOL_METRICS["misses"] += 1
+            return _open_driver(key, db_config)
+
+        POOL_METRICS["hits"] += 1
+        driver = entry["driver"]
+        if time.monotonic() - entry["checked_at"] < HEALTH_CHECK_INTERVAL:
+            return driver
+        # Claim the health check so concurrent callers don't all run it
+        entry["checked_at"] = time.monotonic()
+
+    try:
+        driver.verify_connectivity()
+    except Exception as e:
+        logger.warning(f"Health check failed for {key[0]}: {e}")
+    else:
+        with _lock:
+            retired = _take_retired(_retired, key)
+        for previous in retired:
+            _close_quietly(previous)
+        return driver
+
+    with _lock:
+        POOL_METRICS["health_check_failures"] += 1
+        entry = _drivers.get(key)
+        if entry is not None and entry["driver"] is not driver:
+            # Another caller already replaced it
+            return entry["driver"]
+        driver = _open_driver(key, db_config)
+        # Bounds the drivers kept open while the database stays unreachable
+        retired = _take_retired(_retired, key)
+    for previous in retired:
+        _close_quietly(previous)
+    return driver
+
+
+async def _close_async_quietly(driver: AsyncDriver):
+    try:
+        await driver.close()
+        POOL_METRICS["closed"] += 1
+    except Exception as e:
+        logger.warning(f"Error closing async Neo4j driver: {e}")
+
+
+def _async_key(key: Tuple[str, str, str, str]) -> Tuple:
+    # One driver per event loop, so threads running their own loops never
+    # evict each other's drivers
+    return key + (asyncio.get_running_loop(),)
+
+
+def _drop_closed_loops():
+    """Forgets the async drivers of event loops that were closed, which can't be closed any more. Must hold _lock."""
+    for key in [key for key in _async_drivers if key[-1].is_closed()]:
+        del _async_drivers[key]
+    _retired_async[:] = [item for item in _retired_async if not item["loop"].is_closed()]
+
+
+async def _open_async_driver(key: Tuple[str, str, str, str], db_config: Dict) -> AsyncDriver:
+    driver = AsyncGraphDatabase.driver(
+        db_config["url"],
+        auth=(db_config["username"], db_config["password"]),
+        **_driver_options(),
+    )
+    loop = asyncio.get_running_loop()
+    if _has_other_credentials([other for other in _async_drivers if other[-1] is loop], key):
+        try:
+            await driver.verify_connectivity()
+        except Exception:
+            await _close_async_quietly(driver)
+            raise
+
+    with _lock:
+        _drop_closed_loops()
+        previous = _async_drivers.pop(_async_key(key), None)
+        if previous is not None:
+            _retired_async.append({"key": key, "loop": loop, "driver": previous["driver"],
+                                   "retired_at": time.monotonic()})
+        _async_drivers[_async_key(key)] = {"driver": driver, "checked_at": time.monotonic()}
+    logger.info(f"Opened async Neo4j driver for {key[0]} (user={key[1]}, database={key[2]})")
+    return driver
+
+
+async def get_async_driver(db_config: Dict) -> AsyncDriver:
+    """
+    Async counterpart of get_driver() for the running event loop.
+
+    Args:
+        db_config: Dictionary containing url, username, password and optionally database
+
+    Returns:
+        A neo4j AsyncDriver owned by the registry. Callers must not close it.
+    """
+    key = _registry_key(db_config)
+
+    entry = _async_drivers.get(_async_key(key))
+    if entry is None:
+        POOL_METRICS["misses"] += 1
+        return await _open_async_driver(key, db_config)
+
+    POOL_METRICS["hits"] += 1
+    driver = entry["driver"]
+    if time.monotonic() - entry["checked_at"] < HEALTH_CHECK_INTERVAL:
+        return driver
+    entry["checked_at"] = time.monotonic()
+
+    loop = asyncio.get_running_loop()
+    try:
+        await driver.verify_connectivity()
+    except Exception as e:
+        logger.warning(f"Health check failed for {key[0]}: {e}")
+    else:
+        with _lock:
+            retired = _take_retired(_retired_async, key, loop)
+        for previous in retired:
+            await _close_async_quietly(previous)
+        return driver
+
+    POOL_METRICS["health_check_failures"] += 1
+    entry = _async_drivers.get(_async_key(key))
+    if entry is not None and entry["driver"] is not driver:
+        return entry["driver"]
+    driver = await _open_async_driver(key, db_config)
+    with _lock:
+        retired = _take_retired(_retired_async, key, loop)
+    for previous in retired:
+        await _close_async_quietly(previous)
+    return driver
+
+
+async def close_all_async():
+    """Closes every async driver opened on the running event loop"""
+    loop = asyncio.get_running_loop()
+    with _lock:
+        _drop_closed_loops()
+        drivers = [_async_drivers.pop(key)["driver"] for key in list(_async_drivers) if key[-1] is loop]
+        drivers += [item["driver"] for item in _retired_async if item["loop"] is loop]
+        _retired_async[:] = [item for item in _retired_async if item["loop"] is not loop]
+    for driver in drivers:
+        await _close_async_quietly(driver)
+
+
+_background_loop = None
+
+
+def _get_background_loop() -> asyncio.AbstractEventLoop:
+    global _background_loop
+    with _lock:
+        if _background_loop is None:
+            _background_loop = asyncio.new_event_loop()
+            threading.Thread(target=_background_loop.run_forever, name="neo4j-async", daemon=True).start()
+        return _background_loop
+
+
+def run_sync(coro):
+    """
+    Runs a coroutine to completion from blocking code.
+
+    Coroutines run on one long-lived background event loop, so the async
+    drivers they open stay pooled across calls, and callers that already
+    run an event loop in their thread can use it too (that loop is blocked
+    until the result is ready).
+    """
+    loop = _get_background_loop()
+    try:
+        running = asyncio.get_running_loop()
+    except RuntimeError:
+        running = None
+    if running is loop:
+        coro.close()
+        raise RuntimeError("run_sync() called from the background loop; await the coroutine instead")
+    return asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+
+def _stop_background_loop():
+    if _background_loop is not None and _background_loop.is_running():
+        try:
+            asyncio.run_coroutine_threadsafe(close_all_async(), _background_loop).result(timeout=10)
+        except Exception as e:
+            logger.warning(f"Error closing async Neo4j drivers: {e}")
+        _background_loop.call_soon_threadsafe(_background_loop.stop)
+
+
+def close_driver(db_config: Dict):
+    """Closes and forgets the driver for a database configuration, if any"""
+    with _lock:
+        entry = _drivers.pop(_registry_key(db_config), None)
+    if entry is not None:
+        _close_quietly(entry["driver"])
+
+
+def close_all():
+    """Closes every registered driver. Safe to call more than once."""
+    with _lock:
+        drivers = [entry["driver"] for entry in _drivers.values()] + [item["driver"] for item in _retired]
+        _drivers.clear()
+        _retired.clear()
+    for driver in drivers:
+        _close_quietly(driver)
+
+
+def pool_metrics() -> Dict:
+    """Returns a snapshot of the registry counters"""
+    with _lock:
+        _drop_closed_loops()
+        return {**POOL_METRICS, "open_drivers": len(_drivers), "open_async_drivers": len(_async_drivers),
+                "retired_drivers": len(_retired) + len(_retired_async)}
+
+
+atexit.register(close_all)
+atexit.register(_stop_background_loop)
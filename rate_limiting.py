@@ -0,0 +1,207 @@
+import os
+import random
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from typing import Awaitable, Callable, Optional, TypeVar
+import openai
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Provider quota settings (0 disables the corresponding limit)
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+LLM_REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))
+LLM_TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "6"))
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+def is_retryable(error: Exception) -> bool:
+    """True for rate limits, transient 5xx responses and connection failures"""
+    if isinstance(error, (openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    status_code = getattr(error, "status_code", None)
+    return status_code in RETRYABLE_STATUS_CODES
+
+
+def retry_delay(error: Exception, attempt: int, base_delay: float = 1.0, max_delay: float = 60.0) -> float:
+    """
+    Delay before the next attempt: the provider's Retry-After when given,
+    otherwise exponential backoff with full jitter.
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    retry_after = headers.get("retry-after")
+    if retry_after:
+        try:
+            return min(max_delay, float(retry_after)) + random.uniform(0, base_delay)
+        except ValueError:
+            pass
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+class TokenBucket:
+    """
+    Async token bucket refilled continuously at per_minute / 60 per second.
+
+    Callers on any event loop or thread share one bucket: each reserves its
+    tokens under a thread lock, possibly running the bucket into debt, and
+    sleeps until the refill covers the reservation. Callers are served in
+    the order they reserved.
+    """
+
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    async def acquire(self, amount: float = 1.0):
+        # A single request larger than the bucket would otherwise wait forever
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            await asyncio.sleep(wait)
+
+
+class SharedSemaphore:
+    """
+    Async semaphore shared by every event loop of the process.
+
+    asyncio.Semaphore belongs to one loop, so the Quart loop and the
+    run_sync() background loop would each get their own cap. Here the count
+    is guarded by a thread lock and a released permit wakes the oldest
+    waiter on its own loop.
+
+    Args:
+        value: Number of permits
+    """
+
+    def __init__(self, value: int):
+        self._value = value
+        self._waiters = deque()
+        self._lock = threading.Lock()
+
+    async def acquire(self):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._value > 0 and not self._waiters:
+                self._value -= 1
+                return
+            future = loop.create_future()
+            self._waiters.append((loop, future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            with self._lock:
+                if (loop, future) in self._waiters:
+                    self._waiters.remove((loop, future))
+                    raise
+            # The permit was handed over as the caller was cancelled
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        with self._lock:
+            while self._waiters:
+                loop, future = self._waiters.popleft()
+                try:
+                    loop.call_soon_threadsafe(self._hand_over, future)
+                    return
+                except RuntimeError:
+                    # The waiter's loop is closed
+                    continue
+            self._value += 1
+
+    def _hand_over(self, future: asyncio.Future):
+        if future.cancelled():
+            self.release()
+        else:
+            future.set_result(None)
+
+    async def __aenter__(self):
+        await self.acquire()
+
+    async def __aexit__(self, *exc_info):
+        self.release()
+
+
+class RateLimiter:
+    """
+    Runs provider calls under a concurrency cap, request and token buckets,
+    and retries transient failures with jittered backoff.
+
+    Args:
+        max_concurrency: Maximum calls in flight at once
+        requests_per_minute: Request quota (0 for unlimited)
+        tokens_per_minute: Token quota (0 for unlimited)
+        max_retries: Attempts after the first before giving up
+    """
+
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 requests_per_minute: float = LLM_REQUESTS_PER_MINUTE,
+                 tokens_per_minute: float = LLM_TOKENS_PER_MINUTE,
+                 max_retries: int = LLM_MAX_RETRIES,
+                 base_delay: float = 1.0, max_delay: float = 60.0):
+        self.max_concurrency = max_concurrency
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.metrics = {"calls": 0, "retries": 0, "failures": 0}
+        # One cap for the whole process, whichever event loop calls
+        self._semaphore = SharedSemaphore(max_concurrency)
+
+    async def call(self, fn: Callable[[], Awaitable[T]], tokens: int = 0) -> T:
+        """
+        Awaits fn() once quota is available, retrying retryable errors.
+
+        Args:
+            fn: Zero-argument callable returning a fresh awaitable per attempt
+            tokens: Estimated tokens the call consumes (prompt + completion)
+
+        Returns:
+            The result of fn()
+        """
+        attempt = 0
+        while True:
+            async with self._semaphore:
+                if self.request_bucket:
+                    await self.request_bucket.acquire(1)
+                if self.token_bucket and tokens:
+                    await self.token_bucket.acquire(tokens)
+                self.metrics["calls"] += 1
+                try:
+                    return await fn()
+                except Exception as e:
+                    if attempt >= self.max_retries or not is_retryable(e):
+                        self.metrics["failures"] += 1
+                        raise
+                    delay = retry_delay(e, attempt, self.base_delay, self.max_delay)
+                    error = e
+
+            # Back off outside the semaphore so other calls keep flowing
+            self.metrics["retries"] += 1
+            attempt += 1
+            logger.warning(f"Retryable provider error ({error}); retry {attempt}/{self.max_retries} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+@lru_cache(maxsize=None)
+def get_llm_rate_limiter() -> RateLimiter:
+    """Returns the per-process limiter shared by every chat model call"""
+    return RateLimiter()
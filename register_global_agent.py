@@ -8,7 +8,12 @@ import logging
 import os
 from dotenv import load_dotenv
 import asyncio
-from global_search_test import perform_global_search
+
+# Load environment variables before the search modules read their settings
+load_dotenv()
+
+from global_search_test import get_global_search_engine
+from neo4j_drivers import close_all, close_all_async, pool_metrics
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -104,7 +109,7 @@ async def webhook():
         logger.info(f"Query: {input_query}")
         
         # Process the query using GraphRAG - properly await the result
-        search_results = await perform_global_search(
+        search_results = await get_global_search_engine().asearch(
             db_config=db_config,
             query=input_query,
         )
@@ -123,9 +128,20 @@ async def webhook():
         logger.error(f"Error in webhook: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/metrics', methods=['GET'])
+async def metrics():
+    """Expose Neo4j driver pool and query embedding counters"""
+    return jsonify({**pool_metrics(), "query_embeddings": get_global_search_engine().embeddings.metrics})
+
+@app.after_serving
+async def shutdown():
+    """Close pooled Neo4j drivers when the server stops"""
+    await close_all_async()
+    close_all()
+
 if __name__ == "__main__":
-    load_dotenv()       # Load environment variables
     init_client()       # Register your agent on Agentverse
+    get_global_search_engine()  # Warm the search engine before serving traffic
     
     # Run with hypercorn or another ASGI server
     import hypercorn.asyncio
@@ -1,5 +1,5 @@
-from flask import Flask, request, jsonify
-from flask_cors import CORS
+from quart import Quart, request, jsonify
+from quart_cors import cors
 from uagents.crypto import Identity
 from fetchai.registration import register_with_agentverse
 from fetchai.communication import parse_message_from_agent, send_message_to_agent
@@ -7,13 +7,19 @@ import logging
 import os
 from dotenv import load_dotenv
 import asyncio
-from local_search import local_search
+
+# Load environment variables before the search modules read their settings
+load_dotenv()
+
+from local_search import get_local_search_engine
+from neo4j_drivers import close_all, close_all_async, pool_metrics
+from search_cache import get_neighborhood_cache
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
-app = Flask(__name__)
-CORS(app)
+app = Quart(__name__)
+app = cors(app)
 
 # Initialising client identity to get registered on agentverse
 client_identity = None
@@ -81,12 +87,13 @@ def init_client():
 
 # app route to receive the messages from other agents
 @app.route('/webhook', methods=['POST'])
-def webhook():
+async def webhook():
     """Handle incoming messages"""
     global client_identity
     try:
         # Parse the incoming webhook message
-        data = request.get_data().decode("utf-8")
+        data = await request.get_data()
+        data = data.decode("utf-8")
         logger.info("Received entity search query")
 
         message = parse_message_from_agent(data)
@@ -109,10 +116,11 @@ def webhook():
         logger.info(f"Query: {input_query}")
         logger.info(f"Using database: {db_config['url']} with index: {db_config['index_name']}")
         
-        # Process the query using local search functionality
-        search_results = local_search(
+        # Process the query using local search functionality without blocking the event loop
+        search_results = await get_local_search_engine().asearch(
             neo4j_config=db_config,
             query=input_query,
+            k=top_k,
         )
         
         # Prepare the response payload
@@ -122,14 +130,33 @@ def webhook():
         }
         
         logger.info(f"Sending response to agent: {agent_address}")
-        send_message_to_agent(client_identity, agent_address, payload)
+        await asyncio.to_thread(send_message_to_agent, client_identity, agent_address, payload)
         return jsonify({"status": "success"})
 
     except Exception as e:
         logger.error(f"Error in webhook: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/metrics', methods=['GET'])
+async def metrics():
+    """Expose Neo4j driver pool, neighborhood cache and query embedding counters"""
+    return jsonify({**pool_metrics(), "neighborhood_cache": get_neighborhood_cache().metrics,
+                    "query_embeddings": get_local_search_engine().embeddings.metrics})
+
+@app.after_serving
+async def shutdown():
+    """Close pooled Neo4j drivers when the server stops"""
+    await close_all_async()
+    close_all()
+
 if __name__ == "__main__":
-    load_dotenv()       # Load environment variables
     init_client()       # Register your agent on Agentverse
-    app.run(host="0.0.0.0", port=5003)
\ No newline at end of file
+    get_local_search_engine()  # Warm the search engine before serving traffic
+
+    # Run with hypercorn or another ASGI server
+    import hypercorn.asyncio
+    import hypercorn.config
+
+    config = hypercorn.config.Config()
+    config.bind = ["0.0.0.0:5003"]
+    asyncio.run(hypercorn.asyncio.serve(app, config))
\ No newline at end of file
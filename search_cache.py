@@ -0,0 +1,447 @@
+import os
+import re
+import time
+import hashlib
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from neo4j_drivers import get_async_driver, get_driver
+
+logger = logging.getLogger(__name__)
+
+# Cache settings (SEARCH_CACHE_PATH unset keeps the cache in memory only)
+SEARCH_CACHE_PATH = os.getenv("SEARCH_CACHE_PATH")
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "1000"))
+SEARCH_CACHE_TTL_SECONDS = float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "86400"))
+SEARCH_CACHE_SIMILARITY = float(os.getenv("SEARCH_CACHE_SIMILARITY", "0.95"))
+
+# How long a process trusts the graph version it last read from Neo4j
+GRAPH_VERSION_CHECK_INTERVAL = float(os.getenv("GRAPH_VERSION_CHECK_INTERVAL", "30"))
+
+graph_version_query = """
+MATCH (v:__GraphVersion__ {id: 'graph'})
+RETURN v.version AS version
+"""
+
+bump_graph_version_query = """
+MERGE (v:__GraphVersion__ {id: 'graph'})
+SET v.version = randomUUID(), v.updated_at = datetime()
+RETURN v.version AS version
+"""
+
+
+def normalize_query(query: str) -> str:
+    """Lower-cases, collapses whitespace and drops trailing punctuation"""
+    return re.sub(r"\s+", " ", query).strip().lower().rstrip("?!. ")
+
+
+def db_identity(db_config: Dict) -> str:
+    """Identifies the database a cached answer came from"""
+    return f'{db_config["url"]}|{db_config.get("database", "neo4j")}'
+
+
+def cache_scope(db_config: Dict, version: str, *parts) -> Tuple[str, str]:
+    """
+    Returns the (identity, namespace) a search answer is cached under.
+
+    The credentials are hashed into the namespace so an answer is only
+    served to callers who could have run the search themselves.
+    """
+    auth = hashlib.sha256(f'{db_config["username"]}:{db_config["password"]}'.encode("utf-8")).hexdigest()[:16]
+    return db_identity(db_config), "|".join([*map(str, parts), f"auth={auth}", f"v={version}"])
+
+
+_versions: Dict[str, Tuple[str, float]] = {}
+
+
+def _cached_version(db_config: Dict) -> Optional[str]:
+    entry = _versions.get(db_identity(db_config))
+    if entry is not None and time.monotonic() - entry[1] < GRAPH_VERSION_CHECK_INTERVAL:
+        return entry[0]
+    return None
+
+
+def graph_version(db_config: Dict) -> str:
+    """Current graph version written by the importer ("0" if never imported)"""
+    version = _cached_version(db_config)
+    if version is None:
+        records, _, _ = get_driver(db_config).execute_query(
+            graph_version_query, database_=db_config.get("database", "neo4j")
+        )
+        version = records[0]["version"] if records else "0"
+        _versions[db_identity(db_config)] = (version, time.monotonic())
+    return version
+
+
+async def agraph_version(db_config: Dict) -> str:
+    """Async variant of graph_version()"""
+    version = _cached_version(db_config)
+    if version is None:
+        driver = await get_async_driver(db_config)
+        records, _, _ = await driver.execute_query(
+            graph_version_query, database_=db_config.get("database", "neo4j")
+        )
+        version = records[0]["version"] if records else "0"
+        _versions[db_identity(db_config)] = (version, time.monotonic())
+    return version
+
+
+def bump_graph_version(db_config: Dict) -> str:
+    """Marks the graph as changed so every process stops serving cached answers for it"""
+    records, _, _ = get_driver(db_config).execute_query(
+        bump_graph_version_query, database_=db_config.get("database", "neo4j")
+    )
+    version = records[0]["version"]
+    _versions[db_identity(db_config)] = (version, time.monotonic())
+    return version
+
+
+class SemanticCache:
+    """
+    LRU + TTL cache of search answers, matched on the normalized query text
+    or, failing that, on query-embedding cosine similarity.
+
+    Entries are scoped by (identity, namespace): identity names the database
+    and namespace holds everything else the answer depends on (search kind,
+    index, parameters, graph version). With a path, entries are written
+    through to SQLite and reloaded on start so they survive restarts.
+
+    Args:
+        path: SQLite file, or None for a memory-only cache
+        max_entries: LRU capacity
+        ttl: Seconds an entry stays valid
+        similarity_threshold: Minimum cosine similarity for a semantic hit
+    """
+
+    def __init__(self, path: Optional[str] = SEARCH_CACHE_PATH,
+                 max_entries: int = SEARCH_CACHE_MAX_ENTRIES,
+                 ttl: float = SEARCH_CACHE_TTL_SECONDS,
+                 similarity_threshold: float = SEARCH_CACHE_SIMILARITY):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.metrics = {"exact_hits": 0, "semantic_hits": 0, "misses": 0}
+        self._entries: "OrderedDict[Tuple[str, str, str], Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS search_cache (
+                    identity TEXT, namespace TEXT, query TEXT,
+                    embedding BLOB, response TEXT, created_at REAL,
+                    PRIMARY KEY (identity, namespace, query)
+                )
+                """
+            )
+            self._db.commit()
+            self._load()
+
+    def _load(self):
+        # Wall-clock time is persisted since monotonic time resets on restart
+        rows = self._db.execute(
+            "SELECT identity, namespace, query, embedding, response, created_at FROM search_cache "
+            "WHERE created_at > ? ORDER BY created_at DESC LIMIT ?",
+            (time.time() - self.ttl, self.max_entries),
+        ).fetchall()
+        for identity, namespace, query, embedding, response, created_at in reversed(rows):
+            self._entries[(identity, namespace, query)] = {
+                "embedding": np.frombuffer(embedding, dtype=np.float32) if embedding else None,
+                "response": response,
+                "created_at": created_at,
+            }
+        logger.info(f"Loaded {len(rows)} cached search answers from disk")
+
+    def _expired(self, entry: Dict) -> bool:
+        return time.time() - entry["created_at"] > self.ttl
+
+    def _delete(self, keys: List[Tuple[str, str, str]]):
+        for key in keys:
+            self._entries.pop(key, None)
+        if self._db is not None and keys:
+            self._db.executemany(
+                "DELETE FROM search_cache WHERE identity = ? AND namespace = ? AND query = ?", keys
+            )
+            self._db.commit()
+
+    def get(self, identity: str, namespace: str, query: str,
+            embedding: Optional[List[float]] = None) -> Optional[str]:
+        """
+        Returns a cached answer for the query, or None.
+
+        The normalized query text is tried first, so exact repeats need no
+        embedding. With an embedding, the most similar entry in the same
+        scope is returned if it clears the similarity threshold.
+        """
+        key = (identity, namespace, normalize_query(query))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not self._expired(entry):
+                self._entries.move_to_end(key)
+                self.metrics["exact_hits"] += 1
+                return entry["response"]
+
+            if embedding is not None:
+                candidates, expired = [], []
+                for other_key, other in self._entries.items():
+                    if other_key[:2] != key[:2] or other["embedding"] is None:
+                        continue
+                    if self._expired(other):
+                        expired.append(other_key)
+                    else:
+                        candidates.append((other_key, other))
+                self._delete(expired)
+
+                if candidates:
+                    query_vector = _unit(embedding)
+                    matrix = np.vstack([other["embedding"] for _, other in candidates])
+                    similarities = matrix @ query_vector
+                    best = int(np.argmax(similarities))
+                    if similarities[best] >= self.similarity_threshold:
+                        best_key, best_entry = candidates[best]
+                        self._entries.move_to_end(best_key)
+                        self.metrics["semantic_hits"] += 1
+                        return best_entry["response"]
+
+            if embedding is not None:
+                self.metrics["misses"] += 1
+            return None
+
+    def put(self, identity: str, namespace: str, query: str,
+            embedding: Optional[List[float]], response: str):
+        """Stores an answer, evicting the least recently used entries beyond capacity"""
+        key = (identity, namespace, normalize_query(query))
+        vector = _unit(embedding) if embedding is not None else None
+        created_at = time.time()
+        with self._lock:
+            self._entries[key] = {"embedding": vector, "response": response, "created_at": created_at}
+            self._entries.move_to_end(key)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO search_cache VALUES (?, ?, ?, ?, ?, ?)",
+                    (*key, vector.tobytes() if vector is not None else None, response, created_at),
+                )
+                self._db.commit()
+            overflow = len(self._entries) - self.max_entries
+            if overflow > 0:
+                self._delete(list(self._entries.keys())[:overflow])
+
+    def invalidate(self, identity: Optional[str] = None):
+        """Drops every entry for a database identity, or everything when identity is None"""
+        with self._lock:
+            keys = [key for key in self._entries if identity is None or key[0] == identity]
+            for key in keys:
+                self._entries.pop(key, None)
+            if self._db is not None:
+                if identity is None:
+                    self._db.execute("DELETE FROM search_cache")
+                else:
+                    self._db.execute("DELETE FROM search_cache WHERE identity = ?", (identity,))
+                self._db.commit()
+
+
+def _unit(embedding: List[float]) -> np.ndarray:
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+@lru_cache(maxsize=None)
+def get_search_cache() -> SemanticCache:
+    """Returns the per-process search answer cache"""
+    return SemanticCache()
+
+
+def invalidate_search_cache(db_config: Dict):
+    """Called by the importer after writing a new graph version"""
+    bump_graph_version(db_config)
+    get_search_cache().invalidate(db_identity(db_config))
+
+
+# Map-phase results are persisted by default so repeated global queries and
+# the importer's invalidation work across processes and restarts
+MAP_CACHE_PATH = os.getenv("MAP_CACHE_PATH", "map_cache.sqlite")
+MAP_CACHE_TTL_SECONDS = float(os.getenv("MAP_CACHE_TTL_SECONDS", str(7 * 86400)))
+
+
+def content_hash(text: Optional[str]) -> str:
+    """Hash identifying a community report's content"""
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+class MapResultCache:
+    """
+    Persistent cache of global search map outputs.
+
+    A map call covers a batch of community reports, so its output is stored
+    once per member under (scope, query key, community id) together with the
+    member's content hash and the batch it belongs to. The scope is the
+    db_identity() of the database, since community ids repeat across
+    databases. A cached batch is only reused when every member is among the
+    communities being mapped and still has the same content hash; otherwise
+    the communities are mapped again.
+
+    Args:
+        path: SQLite file (":memory:" for a process-local cache)
+        ttl: Seconds an entry stays valid
+    """
+
+    def __init__(self, path: str = MAP_CACHE_PATH, ttl: float = MAP_CACHE_TTL_SECONDS):
+        self.ttl = ttl
+        self.metrics = {"hits": 0, "misses": 0}
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        # Entries of the unscoped table can't be told apart by database
+        self._db.execute("DROP TABLE IF EXISTS map_results")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS scoped_map_results (
+                scope TEXT, query TEXT, community TEXT, content_hash TEXT,
+                batch TEXT, batch_size INTEGER, output TEXT, created_at REAL,
+                PRIMARY KEY (scope, query, community, batch)
+            )
+            """
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS scoped_map_results_community ON scoped_map_results (scope, community)"
+        )
+        self._db.commit()
+
+    def lookup(self, scope: str, query_key: str, reports: List[Tuple[str, str]]) -> Tuple[List[str], List[int]]:
+        """
+        Splits reports into cached outputs and the indices still to map.
+
+        Args:
+            scope: db_identity() of the database the reports come from
+            query_key: Key from map_query_key()
+            reports: (community id, content hash) per report being mapped
+
+        Returns:
+            (outputs of usable cached batches, indices of reports without one)
+        """
+        current = {str(community): digest for community, digest in reports}
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT community, content_hash, batch, batch_size, output FROM scoped_map_results "
+                "WHERE scope = ? AND query = ? AND created_at > ?",
+                (scope, query_key, time.time() - self.ttl),
+            ).fetchall()
+
+        batches: Dict[str, Dict] = {}
+        for community, digest, batch, batch_size, output in rows:
+            entry = batches.setdefault(batch, {"size": batch_size, "output": output, "members": set(), "valid": True})
+            entry["members"].add(community)
+            if current.get(community) != digest:
+                entry["valid"] = False
+
+        outputs, covered = [], set()
+        for entry in batches.values():
+            members = entry["members"]
+            if entry["valid"] and len(members) == entry["size"] and not members & covered:
+                outputs.append(entry["output"])
+                covered |= members
+
+        pending = [i for i, (community, _) in enumerate(reports) if str(community) not in covered]
+        self.metrics["hits"] += len(reports) - len(pending)
+        self.metrics["misses"] += len(pending)
+        return outputs, pending
+
+    def store(self, scope: str, query_key: str, members: List[Tuple[str, str]], output: str):
+        """Stores the output of one map call over members [(community id, content hash)] of a database scope"""
+        member_key = "|".join(sorted(f"{community}:{digest}" for community, digest in members))
+        batch = content_hash(f"{query_key}|{member_key}")
+        created_at = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO scoped_map_results VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(scope, query_key, str(community), digest, batch, len(members), output, created_at)
+                 for community, digest in members],
+            )
+            self._db.commit()
+
+    def invalidate_changed(self, scope: str, reports: Dict[str, str]) -> int:
+        """
+        Drops entries of a database scope for communities whose content hash
+        differs from reports ({community id: content hash}) or that no longer
+        exist. Other databases' entries are left alone.
+        """
+        with self._lock:
+            stored = self._db.execute(
+                "SELECT DISTINCT community, content_hash FROM scoped_map_results WHERE scope = ?", (scope,)
+            ).fetchall()
+            stale = [
+                (scope, community, digest) for community, digest in stored
+                if reports.get(community) != digest
+            ]
+            self._db.executemany(
+                "DELETE FROM scoped_map_results WHERE scope = ? AND community = ? AND content_hash = ?", stale
+            )
+            self._db.commit()
+        logger.info(f"Invalidated cached map results for {len(stale)} changed communities")
+        return len(stale)
+
+
+def map_query_key(model: str, query: str) -> str:
+    """Map outputs depend on the model and the question only"""
+    return f"{model}|{normalize_query(query)}"
+
+
+@lru_cache(maxsize=None)
+def get_map_result_cache() -> MapResultCache:
+    """Returns the per-process map result cache"""
+    return MapResultCache()
+
+
+# Per-entity neighborhood lookups for local search (entries, not answers)
+NEIGHBORHOOD_CACHE_MAX_ENTRIES = int(os.getenv("NEIGHBORHOOD_CACHE_MAX_ENTRIES", "50000"))
+
+
+class NeighborhoodCache:
+    """
+    In-memory LRU of per-entity graph lookups (an entity's chunks, reports,
+    relationships). Scopes come from cache_scope(), so they carry the graph
+    version and entries of an older import simply age out.
+
+    Args:
+        max_entries: LRU capacity
+    """
+
+    def __init__(self, max_entries: int = NEIGHBORHOOD_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.metrics = {"hits": 0, "misses": 0}
+        self._entries: "OrderedDict[Tuple, object]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, scope: Tuple[str, str], lookup: str, keys: List) -> Tuple[Dict, List]:
+        """Returns ({key: cached value}, [keys not cached])"""
+        found, missing = {}, []
+        with self._lock:
+            for key in keys:
+                entry_key = (*scope, lookup, key)
+                if entry_key in self._entries:
+                    self._entries.move_to_end(entry_key)
+                    found[key] = self._entries[entry_key]
+                else:
+                    missing.append(key)
+            self.metrics["hits"] += len(found)
+            self.metrics["misses"] += len(missing)
+        return found, missing
+
+    def put_many(self, scope: Tuple[str, str], lookup: str, values: Dict):
+        with self._lock:
+            for key, value in values.items():
+                self._entries[(*scope, lookup, key)] = value
+                self._entries.move_to_end((*scope, lookup, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+@lru_cache(maxsize=None)
+def get_neighborhood_cache() -> NeighborhoodCache:
+    """Returns the per-process neighborhood cache"""
+    return NeighborhoodCache()